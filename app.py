@@ -1,22 +1,28 @@
-import json
 import logging
-from flask import Flask, request, jsonify, render_template, Response, stream_with_context
-
-# Import your Asistente class from the separate module
-from classes.asistente import Asistente
-from classes.RAG import RAGService
-from classes.asistente_osma import AsistenteOSMA
-
-# Optionally configure or tweak logging here
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s"
-)
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g
+
+from classes.web_handlers import AppHandlers, RequestError, SSE_HEADERS, get_session_id, persist_session_cookie, wants_sse
+from classes.tracing import registry, METRICS_MIMETYPE
+from classes.log_setup import configure_logging
+
+# Log records are written by a background thread (LOG_LEVEL, LOG_DUMP_SAMPLE_RATE, LOG_MAX_CHARS)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-asistente = Asistente()  # Instantiate your class from classes/asistente.py
-rag_service = RAGService()
+# Assistant, RAG service, OSMA sessions and SSE buffers, shared with asgi_app.py's request handling
+handlers = AppHandlers()
+asistente = handlers.asistente
+
+
+@app.errorhandler(RequestError)
+def request_error(e):
+    return jsonify(e.payload), e.status
+
+
+@app.after_request
+def set_session_cookie(response):
+    return persist_session_cookie(response, g)
 
 @app.route("/", methods=["GET"])
 def home():
@@ -26,45 +32,37 @@ def home():
 @app.route("/erase", methods=["POST"])
 def erase():
     """
-    Erase the last (query, response) pair from context_history.
+    Erase the last (query, response) pair from the caller's conversation history.
     """
-    logger.debug("=== Before erase ===")
-    logger.debug(json.dumps(asistente.context_history, indent=2, ensure_ascii=False))
-
-    if asistente.context_history:
-        popped = asistente.context_history.pop()
-        logger.debug(f"Popped last item: {json.dumps(popped, ensure_ascii=False)}")
-
-    logger.debug("=== After erase ===")
-    logger.debug(json.dumps(asistente.context_history, indent=2, ensure_ascii=False))
-
-    return jsonify({"message": "Erased last user query and assistant response from context."}), 200
+    return jsonify(handlers.erase(get_session_id(request, g))), 200
 
 @app.route("/feedback", methods=["POST"])
 def feedback():
     """
     Receive feedback from the user and log/save it somewhere.
     """
-    data = request.get_json()
-    feedback_text = data.get("feedback", "")
+    return jsonify(handlers.feedback(request.get_json())), 200
 
-    if not feedback_text.strip():
-        return jsonify({"message": "Error: No feedback text provided"}), 400
-
-    # Example: print or log to console
-    logger.info(f"=== FEEDBACK RECEIVED ===\n{feedback_text}\n========================\n")
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """
+    Hit/miss counters of the answer cache.
+    """
+    return jsonify(handlers.cache_stats())
 
-    return jsonify({"message": "¡Gracias por tu feedback!"}), 200
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Per-stage latency histograms in the Prometheus text format.
+    """
+    return Response(registry.render(), mimetype=METRICS_MIMETYPE)
 
 @app.route("/check_rag", methods=["POST"])
 def check_rag():
     """
     Check if the user's query should use RAG (GroundX retrieval).
     """
-    data = request.get_json()
-    user_message = data.get("message", "")
-    rag_used = rag_service.should_call_groundx(user_message)
-    return jsonify({"is_rag": rag_used})
+    return jsonify(handlers.check_rag(request.get_json()))
 
 @app.route("/chat_stream", methods=["POST"])
 def chat_stream():
@@ -72,15 +70,17 @@ def chat_stream():
     Streams the completion response chunk-by-chunk to the client.
     """
     data = request.get_json()
-    user_message = data.get("message", "")
+    user_message, is_rag = handlers.chat_request(data)
+    session_id = get_session_id(request, g)
 
-    if not user_message:
-        return jsonify({"message": "Error: No message provided"}), 400
+    if wants_sse(data, request.headers.get("Accept", "")):
+        buffer = handlers.stream_registry.start(asistente.chat_completions_stream(user_message, session_id, is_rag=is_rag))
+        return Response(buffer.events(), mimetype="text/event-stream", headers=SSE_HEADERS)
 
     try:
         def generate():
             # Use your Asistente's streaming method
-            for chunk in asistente.chat_completions_stream(user_message):
+            for chunk in asistente.chat_completions_stream(user_message, session_id, is_rag=is_rag):
                 yield chunk
 
         return Response(
@@ -92,18 +92,22 @@ def chat_stream():
         return jsonify({"message": f"Error: {e}"}), 500
 
 
+@app.route("/chat_stream/resume", methods=["GET"])
+def chat_stream_resume():
+    """
+    Replay the events of an SSE answer after the given Last-Event-ID and keep streaming it.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "")
+    buffer, seq = handlers.resume(last_event_id)
+    return Response(buffer.events(after_seq=seq), mimetype="text/event-stream", headers=SSE_HEADERS)
+
 @app.route("/osma_init", methods=["POST"])
 def osma_init():
     """
-    Inicializa la sesión OSMA creando una instancia de AsistenteOSMA.
+    Inicializa la sesión OSMA del usuario con un AsistenteOSMA nuevo.
     Devuelve el prompt inicial y las opciones de servicios disponibles.
     """
-    global osma_assistant
-    osma_assistant = AsistenteOSMA()
-    services = list(osma_assistant.data.keys())
-    prompt = "¿Qué servicio(s) desea seleccionar?"
-    logger.info("Se ha iniciado la sesión OSMA")
-    return jsonify({"prompt": prompt, "services": services})
+    return jsonify(handlers.osma_init(get_session_id(request, g)))
 
 
 @app.route("/osma_respond", methods=["POST"])
@@ -112,41 +116,39 @@ def osma_respond():
     Procesa la respuesta del usuario en el flujo OSMA y devuelve
     el siguiente prompt y, cuando corresponda, las opciones para el siguiente formulario.
     """
-    global osma_assistant
-    if osma_assistant is None:
-        return jsonify({"error": "No se ha iniciado la sesión OSMA"}), 400
+    return jsonify(handlers.osma_respond(get_session_id(request, g), request.get_json()))
 
-    data = request.get_json()
-    respuesta = data.get("respuesta", "").strip()
-    if respuesta == "":
-        return jsonify({"error": "Respuesta vacía"}), 400
-
-    next_prompt = osma_assistant.procesar_respuesta(respuesta)
-
-    # Según el nuevo estado, devolvemos opciones para el próximo formulario.
-    if osma_assistant.state == 1:
-        # Paso 1: Monitoreables. Se agrupan de todos los servicios seleccionados.
-        monitoreables = set()
-        for serv in osma_assistant.servicio:
-            monitoreables.update(osma_assistant.data.get(serv, {}).keys())
-        return jsonify({"prompt": next_prompt, "monitoreables": list(monitoreables)})
-    elif osma_assistant.state == 2:
-        # Paso 2: Variables.
-        variables = set()
-        for mon in osma_assistant.monitoreable:
-            for serv in osma_assistant.servicio:
-                if mon in osma_assistant.data.get(serv, {}):
-                    for var_item in osma_assistant.data[serv][mon]:
-                        variables.add(var_item.get("Variable"))
-        return jsonify({"prompt": next_prompt, "variables": list(variables)})
-    elif osma_assistant.state == 4:
-        # Paso 4: Intervalo; enviamos las opciones fijas
-        intervals = ["Minuto", "Hora", "Día", "Mes"]
-        return jsonify({"prompt": next_prompt, "intervals": intervals})
-    else:
-        return jsonify({"prompt": next_prompt})
 
+@app.route("/osma_search", methods=["GET"])
+def osma_search():
+    """
+    Búsqueda tolerante (acentos, prefijos, errores de tipeo) sobre el catálogo OSMA.
+    Devuelve las mejores coincidencias, opcionalmente filtradas por tipo y por los
+    servicios/monitoreables seleccionados.
+    """
+    return jsonify(handlers.osma_search(request.args))
+
+
+@app.route("/osma_query", methods=["POST"])
+def osma_query():
+    """
+    Descarga en paralelo todas las variables seleccionadas y devuelve
+    las series alineadas en un único payload.
+    """
+    return jsonify(handlers.osma_query(request.get_json()))
+
+
+@app.route("/osma_export", methods=["POST"])
+def osma_export():
+    """
+    Exporta la consulta OSMA como CSV o Parquet, enviando las filas a medida que
+    llegan los tramos de la API (memoria acotada, la descarga empieza de inmediato).
+    Acepta JSON o un formulario con el campo "consulta" (JSON), para descargas directas.
+    """
+    data = handlers.osma_export_data(request.get_json(silent=True), request.form)
+    cuerpo, mimetype, headers = handlers.osma_export(data)
+    return Response(stream_with_context(cuerpo), mimetype=mimetype, headers=headers)
 
 
 if __name__ == "__main__":
-    app.run(debug=False, port=5000)
\ No newline at end of file
+    app.run(debug=False, port=5000)
@@ -0,0 +1,150 @@
+"""
+Async serving mode: the same endpoints as app.py on Quart (ASGI), using the async
+OpenAI and GroundX clients so each in-flight answer costs a coroutine instead of a
+worker thread. Run with, for example:
+
+    hypercorn asgi_app:app --workers 2 --bind 0.0.0.0:5000
+"""
+import asyncio
+import logging
+from quart import Quart, request, jsonify, render_template, Response, g
+
+from classes.web_handlers import AppHandlers, RequestError, SSE_HEADERS, get_session_id, persist_session_cookie, wants_sse
+from classes.tracing import registry, METRICS_MIMETYPE
+from classes.log_setup import configure_logging
+
+# Log records are written by a background thread (LOG_LEVEL, LOG_DUMP_SAMPLE_RATE, LOG_MAX_CHARS)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+app = Quart(__name__)
+# Request handling shared with app.py. Handlers that use the session store (SQLite)
+# or the OSMA client block, so they run in a thread and the event loop keeps serving
+# other requests meanwhile
+handlers = AppHandlers()
+asistente = handlers.asistente
+
+
+async def _encoded(events):
+    async for event in events:
+        yield event.encode("utf-8")
+
+
+async def _in_thread(parts):
+    """
+    Iterate a blocking generator, producing each part in a thread. When the client
+    disconnects, the part in progress is awaited before closing the generator:
+    closing it while another thread runs it raises ValueError and leaves it open.
+    """
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(asyncio.to_thread(next, parts, None))
+            # Shielded: cancelling the request must not abandon the thread mid-part
+            part = await asyncio.shield(pending)
+            if part is None:
+                return
+            yield part.encode("utf-8") if isinstance(part, str) else part
+    finally:
+        if pending is not None:
+            await asyncio.wait({pending})
+        await asyncio.to_thread(parts.close)
+
+
+@app.errorhandler(RequestError)
+async def request_error(e):
+    return jsonify(e.payload), e.status
+
+
+@app.after_request
+async def set_session_cookie(response):
+    return persist_session_cookie(response, g)
+
+
+@app.route("/", methods=["GET"])
+async def home():
+    return await render_template("index.html")
+
+
+@app.route("/erase", methods=["POST"])
+async def erase():
+    return jsonify(await asyncio.to_thread(handlers.erase, get_session_id(request, g))), 200
+
+
+@app.route("/feedback", methods=["POST"])
+async def feedback():
+    return jsonify(handlers.feedback(await request.get_json())), 200
+
+
+@app.route("/cache_stats", methods=["GET"])
+async def cache_stats():
+    return jsonify(handlers.cache_stats())
+
+
+@app.route("/metrics", methods=["GET"])
+async def metrics():
+    return Response(registry.render(), mimetype=METRICS_MIMETYPE)
+
+
+@app.route("/check_rag", methods=["POST"])
+async def check_rag():
+    return jsonify(await handlers.acheck_rag(await request.get_json()))
+
+
+@app.route("/chat_stream", methods=["POST"])
+async def chat_stream():
+    data = await request.get_json()
+    user_message, is_rag = handlers.chat_request(data)
+    session_id = get_session_id(request, g)
+
+    if wants_sse(data, request.headers.get("Accept", "")):
+        buffer = await handlers.stream_registry.astart(asistente.achat_completions_stream(user_message, session_id, is_rag=is_rag))
+        return Response(_encoded(buffer.aevents()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    async def generate():
+        async for chunk in asistente.achat_completions_stream(user_message, session_id, is_rag=is_rag):
+            yield chunk.encode("utf-8")
+
+    return Response(generate(), mimetype="text/plain")
+
+
+@app.route("/chat_stream/resume", methods=["GET"])
+async def chat_stream_resume():
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "")
+    buffer, seq = await asyncio.to_thread(handlers.resume, last_event_id)
+    return Response(_encoded(buffer.aevents(after_seq=seq)), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.route("/osma_init", methods=["POST"])
+async def osma_init():
+    return jsonify(await asyncio.to_thread(handlers.osma_init, get_session_id(request, g)))
+
+
+@app.route("/osma_respond", methods=["POST"])
+async def osma_respond():
+    data = await request.get_json()
+    return jsonify(await asyncio.to_thread(handlers.osma_respond, get_session_id(request, g), data))
+
+
+@app.route("/osma_search", methods=["GET"])
+async def osma_search():
+    return jsonify(handlers.osma_search(request.args))
+
+
+@app.route("/osma_query", methods=["POST"])
+async def osma_query():
+    # El cliente OSMA es bloqueante: la descarga corre en un hilo
+    return jsonify(await asyncio.to_thread(handlers.osma_query, await request.get_json()))
+
+
+@app.route("/osma_export", methods=["POST"])
+async def osma_export():
+    data = await request.get_json(silent=True)
+    form = None if data else await request.form
+    data = handlers.osma_export_data(data, form)
+    cuerpo, mimetype, headers = await asyncio.to_thread(handlers.osma_export, data)
+    return Response(_in_thread(cuerpo), mimetype=mimetype, headers=headers)
+
+
+if __name__ == "__main__":
+    app.run(debug=False, port=5000)
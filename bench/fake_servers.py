@@ -0,0 +1,214 @@
+"""
+Local stand-ins for the external APIs, so the app can be load-tested offline:
+
+  - OpenAI chat completions (streaming and non-streaming)   POST /v1/chat/completions
+  - GroundX search.content                                   POST /api/v1/search/<bucket>
+  - OSMA login and getDatosAurora / getDatosEnergy           POST /api/login, GET /latest/...
+
+Run the fake servers, then start the app pointed at them:
+
+    python bench/fake_servers.py --port 8900 --latency 0.3 --token-delay 0.02
+
+    OPENAI_API_KEY=x OPENAI_BASE_URL=http://127.0.0.1:8900/v1 \\
+    GROUNDX_API_KEY=x GROUNDX_BASE_URL=http://127.0.0.1:8900/api \\
+    GROUNDX_BUCKET_ID_SPANISH=1 GROUNDX_BUCKET_ID_ENGLISH=2 \\
+    OSMA_LOGIN_URL=http://127.0.0.1:8900/api/login \\
+    OSMA_AURORA_URL=http://127.0.0.1:8900/latest/getDatosAurora \\
+    OSMA_ENERGY_URL=http://127.0.0.1:8900/latest/getDatosEnergy \\
+    OSMA_USERNAME=bench OSMA_PASSWORD=bench \\
+    gunicorn app:app --workers 4 --threads 8 --bind 127.0.0.1:5000
+"""
+import re
+import json
+import math
+import time
+import base64
+import random
+import argparse
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "el cafe de especialidad se tuesta a temperaturas controladas para desarrollar "
+    "azucares y acidez mientras el grano pierde humedad y gana volumen durante el tueste"
+).split()
+
+STEPS = {
+    "MIN": datetime.timedelta(minutes=1),
+    "HOUR": datetime.timedelta(hours=1),
+    "DAY": datetime.timedelta(days=1),
+    "MONTH": datetime.timedelta(days=30),
+}
+
+AURORA_PATH = re.compile(r"/getDatos(?:Aurora|Energy)/(\d+)/([\d-]+)/([\d-]+)/(\w+)/([\d:]+)/([\d:]+)/")
+
+
+def fake_jwt(ttl: float) -> str:
+    def _b64(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    return f"{_b64({'alg': 'none'})}.{_b64({'exp': int(time.time() + ttl)})}.bench"
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Set from the command line in main()
+    config = None
+
+    def log_message(self, format, *args):
+        if self.config.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _wait(self, base: float):
+        # Latency with +-20% jitter, so concurrent requests don't move in lockstep
+        if base > 0:
+            time.sleep(base * random.uniform(0.8, 1.2))
+
+    def do_POST(self):
+        if self.path.endswith("/chat/completions"):
+            return self._chat_completions(self._read_json())
+        if "/v1/search/" in self.path:
+            return self._groundx_search(self._read_json())
+        if self.path.endswith("/login"):
+            self._read_json()
+            self._wait(self.config.login_latency)
+            return self._send_json({"statusCode": 200, "body": {
+                "AccessToken": fake_jwt(self.config.token_ttl), "ExpiresIn": self.config.token_ttl}})
+        self._send_json({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        match = AURORA_PATH.search(self.path)
+        if match:
+            return self._osma_data(*match.groups())
+        self._send_json({"error": "not found"}, status=404)
+
+    # --- OpenAI -------------------------------------------------------------
+
+    def _answer_words(self, n):
+        return [random.choice(WORDS) for _ in range(n)]
+
+    def _reply_for(self, messages):
+        prompt = messages[-1]["content"] if messages else ""
+        if "probabilidad (0-100)" in prompt:
+            query = prompt.rsplit("User query:", 1)[-1].lower()
+            return "90" if re.search(r"caf|grano|tost|tuest|espresso", query) else "10"
+        if "Text to translate:" in prompt:
+            return prompt.rsplit("Text to translate:", 1)[-1].strip()
+        return " ".join(self._answer_words(self.config.tokens))
+
+    def _chat_completions(self, request):
+        created = int(time.time())
+        model = request.get("model", "bench")
+        self._wait(self.config.latency)
+        if not request.get("stream"):
+            content = self._reply_for(request.get("messages", []))
+            return self._send_json({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": 0},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def _chunk(delta, finish_reason=None):
+            event = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self._write_chunk(f"data: {json.dumps(event)}\n\n")
+
+        _chunk({"role": "assistant", "content": ""})
+        for i, word in enumerate(self._answer_words(self.config.tokens)):
+            if i:
+                time.sleep(self.config.token_delay)
+            _chunk({"content": (" " if i else "") + word})
+        _chunk({}, finish_reason="stop")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    # --- GroundX ------------------------------------------------------------
+
+    def _groundx_search(self, request):
+        self._wait(self.config.search_latency)
+        n_words = max(1, self.config.search_chars // 6)
+        chunks = [" ".join(self._answer_words(n_words // 4)) for _ in range(4)]
+        self._send_json({"search": {
+            "count": len(chunks),
+            "query": request.get("query", ""),
+            "score": 50.0,
+            "text": "\n\n".join(chunks),
+            "results": [{"text": chunk, "score": 50.0 - i} for i, chunk in enumerate(chunks)],
+        }})
+
+    # --- OSMA ---------------------------------------------------------------
+
+    def _osma_data(self, id_variable, date_from, date_to, interval, hour_from, hour_to):
+        self._wait(self.config.osma_latency)
+        if not self.headers.get("user_token"):
+            return self._send_json({"message": "Unauthorized"}, status=401)
+        start = datetime.datetime.strptime(f"{date_from} {hour_from}", "%Y-%m-%d %H:%M")
+        end = datetime.datetime.strptime(f"{date_to} {hour_to}", "%Y-%m-%d %H:%M")
+        step = STEPS.get(interval, STEPS["HOUR"])
+        n = min(int((end - start) / step) + 1, self.config.max_points)
+        dates = [(start + i * step).strftime("%Y-%m-%d %H:%M:%S") for i in range(max(n, 0))]
+        seed = int(id_variable)
+        values = [f"{20 + 5 * math.sin((seed + i) / 30.0):.3f}" for i in range(len(dates))]
+        self._send_json({"result": {"status": "OK", "dateTime": dates, "values": values,
+                                    "variable": f"Variable {id_variable}"}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI, GroundX and OSMA APIs for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3, help="OpenAI time to first byte (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="delay between streamed tokens (s)")
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per streamed answer")
+    parser.add_argument("--search-latency", type=float, default=0.4, help="GroundX search latency (s)")
+    parser.add_argument("--search-chars", type=int, default=6000, help="size of each GroundX search text")
+    parser.add_argument("--login-latency", type=float, default=0.5, help="OSMA login latency (s)")
+    parser.add_argument("--token-ttl", type=float, default=3600, help="OSMA access token lifetime (s)")
+    parser.add_argument("--osma-latency", type=float, default=0.3, help="OSMA data call latency (s)")
+    parser.add_argument("--max-points", type=int, default=20000, help="max points per OSMA data call")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    FakeAPIHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), FakeAPIHandler)
+    server.daemon_threads = True
+    print(f"Fake APIs listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Load test for a running app (app.py under gunicorn, or asgi_app.py under hypercorn).
+Each virtual user keeps its own cookie session and repeats its scenario:
+
+  chat: POST /check_rag, then POST /chat_stream (time to first token, tokens/s)
+  osma: /osma_init, the five /osma_respond steps and /osma_query
+
+Typical offline run, against an app pointed at bench/fake_servers.py:
+
+    python bench/load_test.py --base-url http://127.0.0.1:5000 --scenario all --concurrency 20 --iterations 10
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+QUERIES = [
+    "¿Cuál es la temperatura ideal para tostar café?",
+    "¿Qué es el rate of rise en el tueste?",
+    "¿Cómo afecta la altura al grano de café?",
+    "¿Qué diferencia hay entre un tueste claro y uno oscuro?",
+    "¿Cómo se calibra un molino para espresso?",
+    "¿Qué humedad debe tener el café verde?",
+    "¿Cuál es la capital de Francia?",
+    "Escribe un poema sobre el mar",
+    "¿Cómo se calcula el IVA de una factura?",
+    "¿Qué hora es en Tokio?",
+]
+
+
+class Recorder:
+    """
+    Thread-safe collection of samples per metric.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, metric, value):
+        with self._lock:
+            self.samples[metric].append(value)
+
+    def error(self, stage, message):
+        with self._lock:
+            self.errors[stage] += 1
+        print(f"[error] {stage}: {message}")
+
+    def timed(self, stage, fn):
+        t0 = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self.error(stage, e)
+            return None
+        self.add(stage, time.perf_counter() - t0)
+        return result
+
+    def report(self, elapsed):
+        def pct(values, p):
+            return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+        summary = {}
+        for metric, values in sorted(self.samples.items()):
+            values = sorted(values)
+            summary[metric] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": pct(values, 50),
+                "p95": pct(values, 95),
+                "p99": pct(values, 99),
+                "max": values[-1],
+            }
+        return {"elapsed": elapsed, "metrics": summary, "errors": dict(self.errors)}
+
+
+def run_chat(session, base_url, recorder, sse=False):
+    query = random.choice(QUERIES)
+
+    def _check():
+        response = session.post(f"{base_url}/check_rag", json={"message": query}, timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    decision = recorder.timed("check_rag", _check)
+    if decision is None:
+        return
+
+    payload = {"message": query, "rag_token": decision.get("rag_token")}
+    if sse:
+        payload["stream"] = "sse"
+    t0 = time.perf_counter()
+    first = None
+    text = []
+    pending = ""
+    try:
+        with session.post(f"{base_url}/chat_stream", json=payload, stream=True, timeout=300) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if sse:
+                    # Keep the data of complete text events; "start"/"done" events carry a type
+                    pending += chunk
+                    *events, pending = pending.split("\n\n")
+                    chunk = "".join(
+                        "\n".join(line[6:] for line in event.split("\n") if line.startswith("data: "))
+                        for event in events if "\nevent:" not in event and not event.startswith("event:")
+                    )
+                if not chunk:
+                    continue
+                if first is None:
+                    first = time.perf_counter()
+                text.append(chunk)
+    except Exception as e:
+        recorder.error("chat_stream", e)
+        return
+
+    end = time.perf_counter()
+    if first is None:
+        recorder.error("chat_stream", "empty answer")
+        return
+    recorder.add("chat_stream.ttft", first - t0)
+    recorder.add("chat_stream.total", end - t0)
+    tokens = len("".join(text).split())
+    # Answers replayed from the answer cache arrive at once; no meaningful rate
+    if end - first > 0.01:
+        recorder.add("chat_stream.tokens_per_s", tokens / (end - first))
+    recorder.add(f"chat_stream.total.{'rag' if decision.get('is_rag') else 'no_rag'}", end - t0)
+
+
+def run_osma(session, base_url, recorder, n_variables=3):
+    def _post(path, body=None):
+        response = session.post(f"{base_url}{path}", json=body, timeout=300)
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RuntimeError(data["error"])
+        return data
+
+    init = recorder.timed("osma_init", lambda: _post("/osma_init"))
+    if init is None:
+        return
+    services = init["services"][:1]
+    step = recorder.timed("osma_respond", lambda: _post("/osma_respond", {"respuesta": ",".join(services)}))
+    if step is None:
+        return
+    monitoreables = step.get("monitoreables", [])[:1]
+    step = recorder.timed("osma_respond", lambda: _post("/osma_respond", {"respuesta": ",".join(monitoreables)}))
+    if step is None:
+        return
+    variables = step.get("variables", [])[:n_variables]
+    fecha_inicio, fecha_fin = "2025-01-15T08:00", "2025-01-16T08:00"
+    for respuesta in (",".join(variables), f"{fecha_inicio},{fecha_fin}", "Hora"):
+        if recorder.timed("osma_respond", lambda: _post("/osma_respond", {"respuesta": respuesta})) is None:
+            return
+
+    query = {
+        "services": services,
+        "monitoreables": monitoreables,
+        "variables": variables,
+        "fechaInicio": fecha_inicio,
+        "fechaFin": fecha_fin,
+        "intervalo": "Minuto",
+    }
+    recorder.timed("osma_query", lambda: _post("/osma_query", query))
+
+
+def virtual_user(args, recorder):
+    session = requests.Session()
+    scenarios = {"chat": ["chat"], "osma": ["osma"], "all": ["chat", "osma"]}[args.scenario]
+    for _ in range(args.iterations):
+        for scenario in scenarios:
+            if scenario == "chat":
+                run_chat(session, args.base_url, recorder, sse=args.sse)
+            else:
+                run_osma(session, args.base_url, recorder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive /check_rag, /chat_stream and the OSMA flow at a target concurrency.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--scenario", choices=["chat", "osma", "all"], default="chat")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=5, help="scenario runs per virtual user")
+    parser.add_argument("--sse", action="store_true", help="use the SSE mode of /chat_stream")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [executor.submit(virtual_user, args, recorder) for _ in range(args.concurrency)]:
+            future.result()
+    report = recorder.report(time.perf_counter() - t0)
+
+    print(f"\n{args.scenario} x {args.concurrency} users x {args.iterations} iterations in {report['elapsed']:.1f}s")
+    print(f"{'metric':<34}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for metric, s in report["metrics"].items():
+        print(f"{metric:<34}{s['count']:>7}{s['mean']:>10.3f}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['p99']:>10.3f}{s['max']:>10.3f}")
+    if report["errors"]:
+        print(f"errors: {report['errors']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import json
+import argparse
+
+from classes.local_index import LOCAL_INDEX_PATH, EMBEDDING_DIM, LocalIndex, build_local_index
+
+# Build the local first-tier index from the text of the documents mirrored in a GroundX bucket:
+#   pdftotext -layout "Green Coffee Classification.pdf" corpus/en/"Green Coffee Classification.txt"
+#   python build_local_index.py --source corpus/es:<spanish bucket id> --source corpus/en:<english bucket id>
+# Pages of pdftotext output (form feeds) are kept so answers can cite them.
+# Workers load the index once (memory-mapped): restart them after rebuilding it.
+# Check the scores of a few queries to tune LOCAL_INDEX_MIN_SCORE:
+#   python build_local_index.py --query "¿Qué es el rate of rise?" --query "capital de Francia"
+
+
+def load_source(source):
+    """
+    Documents of a "PATH:BUCKET_ID" source: every .txt/.md file of a directory (one
+    document per file, one entry per page), or a JSONL file of {"title", "text", "page"}.
+    """
+    path, _, bucket_id = source.rpartition(":")
+    if not path or not bucket_id.isdigit():
+        raise ValueError(f"Expected PATH:BUCKET_ID, got '{source}'")
+    bucket_id = int(bucket_id)
+
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield {"title": item["title"], "text": item["text"], "page": item.get("page"), "bucket_id": bucket_id}
+        return
+
+    for filename in sorted(os.listdir(path)):
+        title, extension = os.path.splitext(filename)
+        if extension.lower() not in (".txt", ".md"):
+            continue
+        with open(os.path.join(path, filename), "r", encoding="utf-8") as f:
+            pages = f.read().split("\f")
+        for page, text in enumerate(pages, start=1):
+            if text.strip():
+                yield {"title": title, "text": text, "page": page if len(pages) > 1 else None, "bucket_id": bucket_id}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local BM25 + embedding index of the coffee documents.")
+    parser.add_argument("--source", action="append", default=[], help="PATH:BUCKET_ID (repeatable)")
+    parser.add_argument("--output", default=LOCAL_INDEX_PATH)
+    parser.add_argument("--chunk-words", type=int, default=180)
+    parser.add_argument("--overlap", type=int, default=40)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--query", action="append", default=[], help="print the best chunks of a query")
+    args = parser.parse_args()
+
+    if args.source:
+        documents = [document for source in args.source for document in load_source(source)]
+        meta = build_local_index(documents, args.output, args.chunk_words, args.overlap, args.dim)
+        print(f"Indexed {len(meta['documents'])} documents/pages into {meta['n_chunks']} chunks "
+              f"({len(meta['terms'])} terms, buckets {meta['buckets']}), saved to {args.output}")
+
+    if args.query:
+        index = LocalIndex(args.output)
+        for query in args.query:
+            print(f"\n{query}")
+            for hit in index.search(query, n=3):
+                title = index.documents[index.chunk_doc[hit.chunk]]["title"]
+                print(f"  {hit.score:.3f} (bm25 {hit.bm25:.3f}, cosine {hit.cosine:.3f})  {title}: "
+                      f"{index.chunk_text(hit.chunk)[:80]}...")
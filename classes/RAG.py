@@ -1,81 +1,176 @@
 import os
+import hmac
 import json
 import time
+import asyncio
+import hashlib
 import logging
-from groundx import GroundX
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from classes.cache import SQLiteCache, TwoLevelCache
+from classes.resources import (
+    get_api_config, get_openai_client, get_async_openai_client, get_groundx_client,
+    get_async_groundx_client, get_coffee_keywords, get_keyword_matcher, get_topic_classifier,
+    get_decision_token_secret,
+)
+from classes.text_utils import normalize_query
+from classes.tracing import span, observe
+from classes.local_index import LOCAL_INDEX_MIN_SCORE, get_local_index
+from classes.log_setup import Truncated
 
 logger = logging.getLogger(__name__)
 
+# Classification decisions are reused across users and workers for identical (normalized) queries
+DECISION_CACHE_PATH = os.getenv("DECISION_CACHE_PATH", "decision_cache.sqlite3")
+DECISION_CACHE_SIZE = 5000
+DECISION_CACHE_TTL = 24 * 60 * 60
+# Tokens handed out by /check_rag only need to live until /chat_stream arrives
+DECISION_TOKEN_TTL = 5 * 60
+
+# Concurrent retrieval stage: pool size and per-call timeouts (seconds)
+RETRIEVAL_WORKERS = int(os.getenv("RAG_RETRIEVAL_WORKERS", 16))
+CLASSIFY_TIMEOUT = float(os.getenv("RAG_CLASSIFY_TIMEOUT", 10))
+TRANSLATE_TIMEOUT = float(os.getenv("RAG_TRANSLATE_TIMEOUT", 10))
+SEARCH_TIMEOUT = float(os.getenv("RAG_SEARCH_TIMEOUT", 15))
+
+# Retrieval results and translations: in-process LRU in front of a SQLite file shared by workers
+RETRIEVAL_CACHE_PATH = os.getenv("RETRIEVAL_CACHE_PATH", "retrieval_cache.sqlite3")
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", 7 * 24 * 60 * 60))
+RETRIEVAL_CACHE_SIZE = 5000
+# Empty search results are kept only this long (seconds; 0 = not cached): documents may be ingested meanwhile
+RETRIEVAL_EMPTY_TTL = float(os.getenv("RETRIEVAL_EMPTY_TTL", 5 * 60))
+
+
+def _search_ttl(text: str):
+    return None if text else RETRIEVAL_EMPTY_TTL
+
+
 class RAGService:
     def __init__(self):
-        # 1) Load environment vars or config (similar to what you had in Asistente)
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.groundx_api_key = os.getenv("GROUNDX_API_KEY")
-        self.bucket_id_spanish = os.getenv("GROUNDX_BUCKET_ID_SPANISH")
-        self.bucket_id_english = os.getenv("GROUNDX_BUCKET_ID_ENGLISH")
-
-        if not self.openai_api_key or not self.groundx_api_key \
-           or not self.bucket_id_spanish or not self.bucket_id_english:
-            try:
-                with open('config.json') as config_file:
-                    config = json.load(config_file)
-                    self.openai_api_key = self.openai_api_key or config.get("OPENAI_API_KEY")
-                    self.groundx_api_key = self.groundx_api_key or config.get("GROUNDX_API_KEY")
-                    self.bucket_id_spanish = self.bucket_id_spanish or config.get("GROUNDX_BUCKET_ID_SPANISH")
-                    self.bucket_id_english = self.bucket_id_english or config.get("GROUNDX_BUCKET_ID_ENGLISH")
-            except FileNotFoundError:
-                raise ValueError("No API key or bucket ID found in environment variables or config.json.")
-
-        if not self.bucket_id_spanish or not str(self.bucket_id_spanish).isdigit():
-            raise ValueError("Error: GROUNDX_BUCKET_ID_SPANISH must be a valid integer.")
-
-        # Convert to integer
-        self.bucket_id_spanish = int(self.bucket_id_spanish)
-        self.bucket_id_english = int(self.bucket_id_english)
-
-        # 2) Initialize GroundX
-        self.groundx = GroundX(api_key=self.groundx_api_key)
-
-        # 3) Store an OpenAI client if you want classification & translation
-        self.client = OpenAI(api_key=self.openai_api_key)
-
-        # 4) Load coffee keywords
-        self.coffee_keywords = self.load_coffee_keywords("kw_cafe.txt")
-
-    def load_coffee_keywords(self, filename: str):
-
-        # Get the root directory of the project
-        project_root = os.path.dirname(os.path.abspath(__file__))  # Path to this script
-        project_root = os.path.join(project_root, "..")  # Go one level up to the root
-        file_path = os.path.join(project_root, filename)
-
-        keywords = []
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    # Ignore empty lines or comment lines
-                    if not line or line.startswith("#"):
-                        continue
-                    keywords.append(line.lower())
-        except FileNotFoundError:
-            logger.warning(f"Could not find {filename}, defaulting to empty keyword list.")
-        return keywords
+        # 1) Keys and bucket ids, and the API clients (sync for Flask, async for the ASGI app),
+        #    shared with every other component of the process
+        config = get_api_config()
+        self.bucket_id_spanish = config["GROUNDX_BUCKET_ID_SPANISH"]
+        self.bucket_id_english = config["GROUNDX_BUCKET_ID_ENGLISH"]
+        self.groundx = get_groundx_client()
+        self.async_groundx = get_async_groundx_client()
+        self.client = get_openai_client()
+        self.async_client = get_async_openai_client()
+
+        # 2) Coffee keywords
+        self.coffee_keywords = get_coffee_keywords()
+        self.keyword_matcher = get_keyword_matcher()
+
+        # 3) Local topic classifier, consulted before the LLM classifier
+        self.topic_classifier = get_topic_classifier()
+        self.topic_query_log = os.getenv("TOPIC_QUERY_LOG")
+        self._topic_log_lock = threading.Lock()
+
+        # 3b) Local hybrid index, the first tier of bucket searches (None if not built)
+        self.local_index = get_local_index()
+
+        # 4) Classification decisions, shared by the workers; the tokens issued for them are
+        #    signed instead of stored, so any worker can resolve them
+        self.decision_cache = TwoLevelCache(
+            SQLiteCache(DECISION_CACHE_PATH, ttl=DECISION_CACHE_TTL),
+            maxsize=DECISION_CACHE_SIZE
+        )
+        self.decision_token_secret = get_decision_token_secret()
+
+        # 5) Two-level cache for bucket searches and translations
+        self.retrieval_cache = TwoLevelCache(
+            SQLiteCache(RETRIEVAL_CACHE_PATH, ttl=RETRIEVAL_CACHE_TTL),
+            maxsize=RETRIEVAL_CACHE_SIZE
+        )
+
+        # 6) Thread pool shared by the concurrent retrieval stage
+        self.executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="rag")
 
     def should_call_groundx(self, query: str) -> bool:
+        """
+        Cached wrapper around classify_query: identical queries (after normalization)
+        are classified only once, even when they arrive concurrently.
+        """
+        key = normalize_query(query)
+        return self.decision_cache.get_or_set(key, lambda: self.classify_query(query))
+
+    def _sign_decision(self, query: str, is_rag: str, expires_at: str) -> str:
+        message = f"{normalize_query(query)}\n{is_rag}\n{expires_at}".encode("utf-8")
+        return hmac.new(self.decision_token_secret, message, hashlib.sha256).hexdigest()
+
+    def issue_decision_token(self, query: str, is_rag: bool) -> str:
+        """
+        Return a token that lets a later request reuse this decision: "<is_rag>.<expires_at>.<signature>".
+        """
+        is_rag, expires_at = str(int(is_rag)), str(int(time.time() + DECISION_TOKEN_TTL))
+        return f"{is_rag}.{expires_at}.{self._sign_decision(query, is_rag, expires_at)}"
+
+    def resolve_decision_token(self, token: str, query: str):
+        """
+        Return the decision carried by `token`, or None if it expired, is forged or belongs to another query.
+        """
+        parts = (token or "").split(".")
+        if len(parts) != 3:
+            return None
+        is_rag, expires_at, signature = parts
+        if is_rag not in ("0", "1") or not expires_at.isdigit() or int(expires_at) < time.time():
+            return None
+        if not hmac.compare_digest(signature, self._sign_decision(query, is_rag, expires_at)):
+            return None
+        return is_rag == "1"
+
+    def classify_query(self, query: str) -> bool:
         """
         Checks if the query has coffee-related keywords or if a separate classification
         says it's about coffee above a probability threshold.
         """
-        # 1) Keyword Check
-        lower_query = query.lower()
-        for kw in self.coffee_keywords:
-            if kw in lower_query:
-                logger.info(f"Found keyword '{kw}' => definitely about coffee.")
-                return True
+        with span("classify"):
+            decision = self._classify_locally(query)
+            if decision is not None:
+                return decision
+
+            # 3) Fallback to probability-based classification with the LLM:
+            return self._apply_threshold(query, self.llm_coffee_probability(query))
+
+    def _classify_locally(self, query: str):
+        """
+        Keyword and local-classifier layers. Returns None when the LLM must decide.
+        """
+        # 1) Keyword Check (single pass, accent-insensitive, word-bounded)
+        kw = self.keyword_matcher.find(query)
+        if kw:
+            logger.info("Found keyword '%s' => definitely about coffee.", kw)
+            return True
+
+        # 2) Local classifier: only ambiguous queries go on to the LLM
+        if self.topic_classifier is not None:
+            decision = self.topic_classifier.decide(query)
+            if decision is not None:
+                logger.info("Local topic classifier => about coffee: %s", decision)
+                return decision
+        return None
+
+    def _apply_threshold(self, query: str, probability: float) -> bool:
+        self._log_labelled_query(query, probability)
+        threshold = 50
+        logger.info("Coffee probability: %s%% (threshold=%s)", probability, threshold)
+        return probability >= threshold
+
+    def llm_coffee_probability(self, query: str) -> float:
+        """
+        Ask gpt-3.5-turbo for the probability (0-100) that the query is about coffee.
+        """
+        with span("classify.llm"):
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._classification_messages(query),
+                temperature=0
+            )
+        return self._parse_probability(response.choices[0].message.content.strip())
 
-        # 2) If no keywords found, fallback to probability-based classification:
+    @staticmethod
+    def _classification_messages(query: str) -> list:
         classification_prompt = f"""
             Eres un clasificador de textos sencillo.
             Dada la consulta del usuario, estima la probabilidad (0-100) de que la consulta sea sobre cafe y cualquier disciplina o tematica relacionada con el cafe
@@ -83,63 +178,192 @@ class RAGService:
 
             User query: {query}
         """
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a short text classifier."},
-                {"role": "user", "content": classification_prompt}
-            ],
-            temperature=0
-        )
-        result_text = response.choices[0].message.content.strip()
+        return [
+            {"role": "system", "content": "You are a short text classifier."},
+            {"role": "user", "content": classification_prompt}
+        ]
 
+    @staticmethod
+    def _parse_probability(result_text: str) -> float:
         try:
-            probability = float(result_text)
+            return float(result_text)
         except ValueError:
             logger.info(f"Unexpected classification response: '{result_text}'. Defaulting to 50.")
-            probability = 50.0
+            return 50.0
 
-        threshold = 50
-        logger.info(f"Coffee probability: {probability}% (threshold={threshold})")
-        return probability >= threshold
+    def _log_labelled_query(self, query: str, probability: float):
+        """
+        Append LLM-labelled queries to TOPIC_QUERY_LOG so the local classifier can be retrained on them.
+        """
+        if not self.topic_query_log:
+            return
+        line = json.dumps({"query": query, "probability": probability}, ensure_ascii=False)
+        with self._topic_log_lock:
+            with open(self.topic_query_log, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def search_bucket(self, bucket_id: int, query: str, n: int = 5) -> str:
+        """
+        Search a single GroundX bucket and return the retrieved text ("" if none).
+        The local index answers first when it mirrors the bucket and is confident;
+        GroundX results are cached by (bucket id, n, normalized query); empty ones
+        only for RETRIEVAL_EMPTY_TTL.
+        """
+        local_text = self._search_local(bucket_id, query, n)
+        if local_text is not None:
+            return local_text
+        key = f"search:{bucket_id}:{n}:{normalize_query(query)}"
+        return self.retrieval_cache.get_or_set(
+            key,
+            lambda: self._search_bucket_uncached(bucket_id, query, n),
+            tag=f"bucket:{bucket_id}",
+            ttl_for=_search_ttl
+        )
+
+    def _search_bucket_uncached(self, bucket_id: int, query: str, n: int) -> str:
+        with span(self._search_stage(bucket_id)):
+            content_response = self.groundx.search.content(
+                id=bucket_id,
+                n=n,
+                query=query
+            )
+        results = content_response.search
+        return results.text if results.text else ""
+
+    def _search_local(self, bucket_id: int, query: str, n: int):
+        """
+        First-tier search in the local index. Returns None when the bucket is not
+        mirrored locally or the best chunk scores below LOCAL_INDEX_MIN_SCORE.
+        """
+        if self.local_index is None or not self.local_index.mirrors(bucket_id):
+            return None
+        t0 = time.perf_counter()
+        hits = self.local_index.search(query, bucket_id, n)
+        confident = bool(hits) and hits[0].score >= LOCAL_INDEX_MIN_SCORE
+        # status="fallback" counts the searches that still went to GroundX
+        observe("search.local", time.perf_counter() - t0, "hit" if confident else "fallback")
+        if not confident:
+            return None
+        logger.info("Local index answered bucket %s (score %.3f)", bucket_id, hits[0].score)
+        return self.local_index.format(hits)
+
+    def _search_stage(self, bucket_id: int) -> str:
+        # One histogram series per bucket, so a slow bucket stands out
+        return "search.spanish" if bucket_id == self.bucket_id_spanish else "search.english"
 
     def groundx_search_content(self, query_spanish: str, query_english: str) -> str:
         """
         Perform two GroundX searches: one in the Spanish bucket using the
         Spanish query, and one in the English bucket using the English query.
-        Combine and return both sets of text.
+        Both searches run concurrently; their texts are combined.
         """
-        t0 = time.time()
-
-        # 1) Search Spanish bucket
-        content_response_es = self.groundx.search.content(
-            id=self.bucket_id_spanish,
-            n=5,
-            query=query_spanish
-        )
-        results_es = content_response_es.search
-        text_es = results_es.text if results_es.text else ""
-
-        # 2) Search English bucket
-        content_response_en = self.groundx.search.content(
-            id=self.bucket_id_english,
-            n=5,
-            query=query_english
-        )
-        results_en = content_response_en.search
-        text_en = results_en.text if results_en.text else ""
+        with span("search"):
+            future_es = self.executor.submit(self.search_bucket, self.bucket_id_spanish, query_spanish)
+            future_en = self.executor.submit(self.search_bucket, self.bucket_id_english, query_english)
+            text_es = self._wait_for(future_es, SEARCH_TIMEOUT, "Spanish bucket search", default="")
+            text_en = self._wait_for(future_en, SEARCH_TIMEOUT, "English bucket search", default="")
 
-        t1 = time.time()
-        logger.info(f"groundx_search_content took {t1 - t0:.3f}s")
-
-        # Combine both texts (Spanish + English)
-        combined_text = f"{text_es}\n{text_en}".strip()
+        combined_text = self._combine_contexts(text_es, text_en)
         if not combined_text:
             raise ValueError("No context found in either Spanish or English search.")
 
         return combined_text
 
+    def retrieve_context(self, query: str, is_rag: bool = None):
+        """
+        Concurrent retrieval stage. Returns (is_rag, contexts, degraded): one text per
+        bucket that returned something, each in GroundX relevance order ([] when RAG is
+        not used), and whether a step failed or timed out and fell back.
+
+        The Spanish search and the translation do not depend on the classification,
+        so when the decision is still unknown they start speculatively alongside it.
+        The English search starts as soon as the translation is ready. A bucket that
+        fails or times out is dropped and the other one is kept; so is a classification
+        that fails (no RAG) or a translation that fails (the Spanish query is searched).
+        """
+        if is_rag is False:
+            return False, [], False
+
+        with span("retrieve"):
+            return self._retrieve_context(query, is_rag)
+
+    def _retrieve_context(self, query: str, is_rag):
+        future_es = self.executor.submit(self.search_bucket, self.bucket_id_spanish, query)
+        future_translation = self.executor.submit(self.translate_spanish_to_english, query)
+
+        if is_rag is None:
+            future_classify = self.executor.submit(self.should_call_groundx, query)
+            is_rag = self._wait_for(future_classify, CLASSIFY_TIMEOUT, "classification")
+            if not is_rag:
+                future_es.cancel()
+                future_translation.cancel()
+                return False, [], is_rag is None
+
+        # Fall back to the Spanish query if the translation is not available
+        query_english = self._wait_for(future_translation, TRANSLATE_TIMEOUT, "translation")
+        logger.info("Translated to English => '%s'", Truncated(query_english))
+        future_en = self.executor.submit(self.search_bucket, self.bucket_id_english, query_english or query)
+
+        text_es = self._wait_for(future_es, SEARCH_TIMEOUT, "Spanish bucket search")
+        text_en = self._wait_for(future_en, SEARCH_TIMEOUT, "English bucket search")
+
+        return self._retrieval_result(query_english, text_es, text_en)
+
+    @staticmethod
+    def _retrieval_result(query_english, text_es, text_en):
+        # The waits return None for a step that failed or timed out
+        degraded = query_english is None or text_es is None or text_en is None
+        return True, [text for text in (text_es, text_en) if text], degraded
+
+    @staticmethod
+    def _combine_contexts(text_es: str, text_en: str) -> str:
+        # Combine both texts (Spanish + English)
+        return f"{text_es}\n{text_en}".strip()
+
+    @staticmethod
+    def _wait_for(future, timeout: float, label: str, default=None):
+        """
+        Wait for a retrieval future, returning `default` if it fails or times out.
+        """
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning(f"{label} timed out after {timeout}s")
+        except Exception as e:
+            logger.warning(f"{label} failed: {e}")
+        return default
+
+    def invalidate_retrieval_cache(self, bucket_id: int = None):
+        """
+        Drop cached search results after documents are re-ingested: those of one
+        bucket, or every search result and translation when no bucket is given.
+        """
+        self.retrieval_cache.invalidate(None if bucket_id is None else f"bucket:{bucket_id}")
+        logger.info(f"Retrieval cache invalidated (bucket={bucket_id or 'all'})")
+
     def translate_spanish_to_english(self, text: str) -> str:
+        """
+        Translate the query to English; results are cached by normalized text.
+        """
+        return self.retrieval_cache.get_or_set(
+            f"translate:{normalize_query(text)}",
+            lambda: self._translate_uncached(text),
+            tag="translation"
+        )
+
+    def _translate_uncached(self, text: str) -> str:
+        with span("translate"):
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._translation_messages(text),
+                temperature=0,
+                max_tokens=1000
+            )
+        english_translation = response.choices[0].message.content.strip()
+        return english_translation
+
+    @staticmethod
+    def _translation_messages(text: str) -> list:
         translation_prompt = f"""
             Translate the following text from Spanish to English. 
             Output only the translated text, nothing else.
@@ -147,15 +371,121 @@ class RAGService:
             Text to translate:
             {text}
         """
+        return [
+            {"role": "system", "content": "You are a translator. You translate Spanish text into English."},
+            {"role": "user", "content": translation_prompt}
+        ]
+
+    # ------------------------------------------------------------------
+    # Async variants, used by the ASGI serving path (asgi_app.py)
+    # ------------------------------------------------------------------
+
+    async def ashould_call_groundx(self, query: str) -> bool:
+        key = normalize_query(query)
+        return await self.decision_cache.aget_or_set(key, lambda: self.aclassify_query(query))
+
+    async def aclassify_query(self, query: str) -> bool:
+        with span("classify"):
+            decision = self._classify_locally(query)
+            if decision is not None:
+                return decision
+            return self._apply_threshold(query, await self.allm_coffee_probability(query))
 
-        response = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a translator. You translate Spanish text into English."},
-                {"role": "user", "content": translation_prompt}
-            ],
-            temperature=0,
-            max_tokens=1000
+    async def allm_coffee_probability(self, query: str) -> float:
+        with span("classify.llm"):
+            response = await self.async_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=self._classification_messages(query),
+                temperature=0
+            )
+        return self._parse_probability(response.choices[0].message.content.strip())
+
+    async def atranslate_spanish_to_english(self, text: str) -> str:
+        async def _translate():
+            with span("translate"):
+                response = await self.async_client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=self._translation_messages(text),
+                    temperature=0,
+                    max_tokens=1000
+                )
+            return response.choices[0].message.content.strip()
+
+        return await self.retrieval_cache.aget_or_set(
+            f"translate:{normalize_query(text)}", _translate, tag="translation"
         )
-        english_translation = response.choices[0].message.content.strip()
-        return english_translation
\ No newline at end of file
+
+    async def asearch_bucket(self, bucket_id: int, query: str, n: int = 5) -> str:
+        # The local index takes a few milliseconds: no need to leave the event loop
+        local_text = self._search_local(bucket_id, query, n)
+        if local_text is not None:
+            return local_text
+
+        async def _search():
+            with span(self._search_stage(bucket_id)):
+                content_response = await self.async_groundx.search.content(id=bucket_id, n=n, query=query)
+            results = content_response.search
+            return results.text if results.text else ""
+
+        return await self.retrieval_cache.aget_or_set(
+            f"search:{bucket_id}:{n}:{normalize_query(query)}", _search,
+            tag=f"bucket:{bucket_id}", ttl_for=_search_ttl
+        )
+
+    async def aretrieve_context(self, query: str, is_rag: bool = None):
+        """
+        Async counterpart of retrieve_context, with the same overlap and fallbacks.
+        """
+        if is_rag is False:
+            return False, [], False
+
+        with span("retrieve"):
+            return await self._aretrieve_context(query, is_rag)
+
+    async def _aretrieve_context(self, query: str, is_rag):
+        task_es = asyncio.ensure_future(self.asearch_bucket(self.bucket_id_spanish, query))
+        task_translation = asyncio.ensure_future(self.atranslate_spanish_to_english(query))
+
+        if is_rag is None:
+            is_rag = await self._await_for(self.ashould_call_groundx(query), CLASSIFY_TIMEOUT, "classification")
+            if not is_rag:
+                task_es.cancel()
+                task_translation.cancel()
+                return False, [], is_rag is None
+
+        query_english = await self._await_for(task_translation, TRANSLATE_TIMEOUT, "translation")
+        logger.info("Translated to English => '%s'", Truncated(query_english))
+        task_en = asyncio.ensure_future(self.asearch_bucket(self.bucket_id_english, query_english or query))
+
+        text_es, text_en = await asyncio.gather(
+            self._await_for(task_es, SEARCH_TIMEOUT, "Spanish bucket search"),
+            self._await_for(task_en, SEARCH_TIMEOUT, "English bucket search")
+        )
+
+        return self._retrieval_result(query_english, text_es, text_en)
+
+    @staticmethod
+    async def _await_for(awaitable, timeout: float, label: str, default=None):
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{label} timed out after {timeout}s")
+        except Exception as e:
+            logger.warning(f"{label} failed: {e}")
+        return default
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_rag_service() -> RAGService:
+    """
+    RAG service shared by the process (one set of caches, clients and retrieval pool).
+    """
+    global _default_service
+    if _default_service is None:
+        with _default_lock:
+            if _default_service is None:
+                _default_service = RAGService()
+    return _default_service
@@ -0,0 +1,57 @@
+import hashlib
+import logging
+
+from classes.cache import TTLCache
+from classes.text_utils import normalize_query
+from classes.log_setup import Truncated
+
+logger = logging.getLogger(__name__)
+
+# Filler words that do not change what is being asked ("¿Qué es el RoR?" == "que es ror")
+STOPWORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al", "y", "e",
+    "me", "te", "por", "favor", "puedes", "podrias", "dime", "explicame",
+    "the", "a", "an", "of", "please", "can", "you", "tell",
+}
+
+
+class AnswerCache:
+    """
+    Caches complete answers to history-free questions, keyed by the normalized
+    query and the version (hash) of the instruction they were generated with.
+    """
+
+    def __init__(self, instruction: str, maxsize: int = 2000, ttl: float = 24 * 60 * 60):
+        self.instruction_version = hashlib.sha1(instruction.encode("utf-8")).hexdigest()[:12]
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, query: str):
+        words = [w for w in normalize_query(query).split() if w not in STOPWORDS]
+        return self.instruction_version, " ".join(words)
+
+    def get(self, query: str):
+        answer = self._cache.get(self.key(query))
+        logger.info("Answer cache %s for query='%s'", "hit" if answer else "miss", Truncated(query))
+        return answer
+
+    def set(self, query: str, answer: str):
+        if answer:
+            self._cache.set(self.key(query), answer)
+
+    @staticmethod
+    def replay(answer: str, chunk_size: int = 32):
+        """
+        Yield a cached answer in chunks, like the OpenAI stream does.
+        """
+        for i in range(0, len(answer), chunk_size):
+            yield answer[i:i + chunk_size]
+
+    def stats(self) -> dict:
+        lookups = self._cache.hits + self._cache.misses
+        return {
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "hit_rate": self._cache.hits / lookups if lookups else 0.0,
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+        }
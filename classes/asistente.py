@@ -1,64 +1,38 @@
 import os
-import json
 import time
-import sys
-import io
+import asyncio
 import logging
-from openai import OpenAI
-from groundx import GroundX
 
-from classes.RAG import RAGService
-from classes.instruction_parser import InstructionParser
+from classes.RAG import get_rag_service
+from classes.resources import get_openai_client, get_instruction
+from classes.session_store import create_session_store
+from classes.answer_cache import AnswerCache
+from classes.prompt_builder import PromptBuilder
+from classes.tracing import span, observe
+from classes.log_setup import Truncated, dump_sampled
 
-# Optionally keep your stdout re-encoding
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-
-# 1) Logging configuration
-logging.basicConfig(
-    level=logging.INFO,  # or INFO, etc.
-    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Number of (query, response) pairs kept per session
+MAX_HISTORY_TURNS = 10
+# Answers to history-free questions, reused across users
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 2000))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 60 * 60))
+
 class Asistente:
     def __init__(self):
         """
         Initialize the Asistente class with configurations for OpenAI and GroundX APIs.
         """
-        # Initialize RAG service
-        self.rag_service = RAGService()
-        # Load API keys and bucket ID from environment variables
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.groundx_api_key = os.getenv("GROUNDX_API_KEY")
-        self.bucket_id_spanish = os.getenv("GROUNDX_BUCKET_ID_SPANISH")
-        self.bucket_id_english = os.getenv("GROUNDX_BUCKET_ID_ENGLISH")
-        # Load instruction from JSON file
-
-
-        # If keys are not set in the environment, attempt to load from config.json
-        if not self.openai_api_key or not self.groundx_api_key or not self.bucket_id_spanish or not self.bucket_id_english:
-            try:
-                with open('config.json') as config_file:
-                    config = json.load(config_file)
-                    self.openai_api_key = self.openai_api_key or config.get("OPENAI_API_KEY")
-                    self.groundx_api_key = self.groundx_api_key or config.get("GROUNDX_API_KEY")
-                    self.bucket_id_spanish = self.bucket_id_spanish or config.get("GROUNDX_BUCKET_ID_SPANISH")
-                    self.bucket_id_english = self.bucket_id_english or config.get("GROUNDX_BUCKET_ID_ENGLISH")
-            except FileNotFoundError:
-                raise ValueError("Error: No API key or bucket ID found in environment variables or config.json.")
-
-        # Validate that the bucket ID is a valid integer
-        if not self.bucket_id_spanish or not str(self.bucket_id_spanish).isdigit():
-            raise ValueError("Error: GROUNDX_BUCKET_ID must be a valid integer.")
-
-        # Convert bucket ID to integer
-        self.bucket_id_spanish = int(self.bucket_id_spanish)
-        self.bucket_id_english = int(self.bucket_id_english)
+        # RAG service, API clients and instruction are shared by the whole process
+        self.rag_service = get_rag_service()
+        self.client = get_openai_client()
 
         # Set other configurations
         self.completion_model = "gpt-4o-mini"
-        instruction_parser = InstructionParser("instructions.json")
-        self.instruction = instruction_parser.load_instruction()
+        self.instruction = get_instruction()
+        self.answer_cache = AnswerCache(self.instruction, maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+        self.prompt_builder = PromptBuilder(self.instruction, self.completion_model)
         # self.instruction = (
         #     "Eres un asistente especializado en café y en los procesos de producción del café."
         #     "Tu objetivo principal es utilizar los documentos proporcionados relacionados con el café como la base de conocimiento principal para responder a las consultas de los usuarios."
@@ -91,36 +65,40 @@ class Asistente:
         #     "No compartas enlaces externos en tus respuestas."
         # )
 
-        # Initialize GroundX and OpenAI clients
-        self.groundx = GroundX(api_key=self.groundx_api_key)
-        self.client = OpenAI(api_key=self.openai_api_key)
-
-        # Initialize conversation context
-        self.context_history = []
+        # Per-session conversation context: session_id -> [[query, response], ...]
+        self.conversations = create_session_store("conversation")
 
-        # Load coffee keywords from external file
-        self.coffee_keywords = self.rag_service.load_coffee_keywords("kw_cafe.txt")
+    def get_history(self, session_id: str) -> list:
+        return self.conversations.get(session_id, [])
 
-    def chat_completions(self, query: str) -> str:
-        system_context = self.rag_service.groundx_search_content(query, query)
+    def remember_turn(self, session_id: str, query: str, answer: str):
+        """
+        Append a (query, answer) pair to the session history, keeping only the latest turns.
+        """
+        self.conversations.update(
+            session_id,
+            lambda history: (history + [[query, answer]])[-MAX_HISTORY_TURNS:],
+            default=[]
+        )
 
-        logger.info("\n=== System Context (RAG Retrieval) ===")
-        logger.info(system_context.encode('utf-8', errors='replace').decode('utf-8'))
-        logger.info("=====================================\n")
+    def erase_last_turn(self, session_id: str):
+        """
+        Remove the last (query, response) pair of the session and return it, if any.
+        """
+        popped = []
 
-        messages = [{"role": "system", "content": f"{self.instruction}\n===\n{system_context}\n==="}]
-        for q, a in self.context_history:
-            messages.append({"role": "user", "content": q})
-            messages.append({"role": "assistant", "content": a})
+        def _pop(history):
+            if history:
+                popped.append(history[-1])
+            return history[:-1]
 
-        messages.append({"role": "user", "content": query})
+        self.conversations.update(session_id, _pop, default=[])
+        return popped[0] if popped else None
 
-        logger.info("\n=== Messages Sent to OpenAI API ===")
-        for msg in messages:
-            role = msg['role']
-            content = msg['content'].encode('utf-8', errors='replace').decode('utf-8')
-            logger.info(f"Role: {role}, Content: {content}\n")
-        logger.info("=====================================\n")
+    def chat_completions(self, query: str, session_id: str) -> str:
+        system_context = self.rag_service.groundx_search_content(query, query)
+        messages = self.prompt_builder.build(query, self.get_history(session_id), [system_context])
+        self._log_messages(messages)
 
         response = self.client.chat.completions.create(
             model=self.completion_model,
@@ -130,90 +108,148 @@ class Asistente:
         )
         assistant_response = response.choices[0].message.content.strip()
 
-        self.context_history.append((query, assistant_response))
-        if len(self.context_history) > 10:
-            self.context_history.pop(0)
+        self.remember_turn(session_id, query, assistant_response)
 
         return assistant_response
 
-    def chat_completions_stream(self, query: str):
+    def chat_completions_stream(self, query: str, session_id: str, is_rag: bool = None):
         """
         Similar to chat_completions, but uses stream=True to yield partial chunks.
+        `is_rag` may carry a decision already taken by /check_rag.
         """
-        # 0) Decide if we should do RAG at all
-        if self.rag_service.should_call_groundx(query):
-            start_time = time.time()
-            logger.info(f"chat_completions_stream called with query='{query}'")
-
-            # 1) Translate the Spanish query into English
-            query_english = self.rag_service.translate_spanish_to_english(query)
-            logger.info(f"Translated to English => '{query_english}'")
-
-            # 2) Retrieve RAG context from both Spanish & English buckets
-            system_context = self.rag_service.groundx_search_content(query_spanish=query, query_english=query_english)
-
-            after_groundx = time.time()
-            logger.info("Received system_context...")
-            logger.info(f"groundx_search_content took {after_groundx - start_time:.3f} seconds")
-
-            # For debugging, print context
-            logger.info("\n=== System Context (RAG Retrieval) START ===")
-            logger.info(system_context.encode('utf-8', errors='replace').decode('utf-8'))
-            logger.info("=System Context (RAG Retrieval) END \n")
-        else:
-            logger.info(f"No RAG called with query='{query}'")
-            system_context = (
-                "No coffee documents retrieved for this question. "
-                "Respond using only your general knowledge."
-            )
-
-        after_groundx = time.time()
-        # 3) Build the messages array (system + conversation history + user query)
-        messages = [{"role": "system", "content": f"{self.instruction}\n===\n{system_context}\n==="}]
-        for q, a in self.context_history:
-            messages.append({"role": "user", "content": q})
-            messages.append({"role": "assistant", "content": a})
-
-        messages.append({"role": "user", "content": query})
-
-        logger.info("\n=== Messages Sent to OpenAI API (Streaming) START ===")
-        for msg in messages:
-            role = msg['role']
-            content = msg['content'].encode('utf-8', errors='replace').decode('utf-8')
-            # logger.debug(f"Role: {role}, Content: {content}\n")
-        logger.info("=== Messages Sent to OpenAI API (Streaming) END ===\n")
-
-        pre_openai_time = time.time()
-        logger.info(f"About to call OpenAI, {pre_openai_time - after_groundx:.3f}s since start")
+        # 0) History-free questions are replayed from the answer cache when possible
+        history = self.get_history(session_id)
+        cached_answer = self._cached_answer(query, history)
+        if cached_answer:
+            yield from self.answer_cache.replay(cached_answer)
+            self.remember_turn(session_id, query, cached_answer)
+            return
+
+        # 1-2) Classify, translate and search both buckets concurrently
+        logger.info("chat_completions_stream called with query='%s'", Truncated(query))
+        is_rag, contexts, retrieval_degraded = self.rag_service.retrieve_context(query, is_rag=is_rag)
+        contexts = self._log_context(query, is_rag, contexts)
+
+        # 3) Build the messages array within the token budget (instruction, history, context, query)
+        with span("prompt.build"):
+            messages = self.prompt_builder.build(query, history, contexts)
+        self._log_messages(messages)
 
         # 4) Call the OpenAI API with stream=True
+        start_time = time.perf_counter()
         response = self.client.chat.completions.create(
             model=self.completion_model,
             messages=messages,
             stream=True,
             store=True
         )
-        logger.info("Called OpenAI with stream=True")
-        after_openai_call_time = time.time()
-        logger.info(f"Called OpenAI, waiting for chunks, {after_openai_call_time - pre_openai_time:.3f}s since pre_call")
 
         # 5) The OpenAI API returns chunks as an iterator; yield partial text
         partial_answer = []
+        stream_failed = False
         try:
             for chunk in response:
                 choice_delta = chunk.choices[0].delta
                 chunk_text = choice_delta.content
                 if chunk_text:
+                    if not partial_answer:
+                        observe("openai.first_chunk", time.perf_counter() - start_time)
                     partial_answer.append(chunk_text)
                     yield chunk_text
         except Exception as e:
+            stream_failed = True
             logger.error(f"Streaming error: {e}")
+        observe("openai.stream", time.perf_counter() - start_time, "error" if stream_failed else "ok")
 
-        # 6) Once done, store the final combined answer in context
-        final_answer = "".join(partial_answer).strip()
-        self.context_history.append((query, final_answer))
-        logger.info(f"Final answer length={len(final_answer)}")
+        # 6) Once done, store the final combined answer in context (and in the cache if complete)
+        self._finish_turn(session_id, query, history, partial_answer, stream_failed or retrieval_degraded)
 
-        # Optionally limit history length
-        if len(self.context_history) > 10:
-            self.context_history.pop(0)
+    async def achat_completions_stream(self, query: str, session_id: str, is_rag: bool = None):
+        """
+        Async generator counterpart of chat_completions_stream for the ASGI app:
+        the OpenAI stream is consumed with the async client, so no thread is held
+        while waiting for tokens. The session store blocks (SQLite), so its reads
+        and writes run in a thread as well.
+        """
+        history = await asyncio.to_thread(self.get_history, session_id)
+        cached_answer = self._cached_answer(query, history)
+        if cached_answer:
+            for chunk in self.answer_cache.replay(cached_answer):
+                yield chunk
+            await asyncio.to_thread(self.remember_turn, session_id, query, cached_answer)
+            return
+
+        logger.info("achat_completions_stream called with query='%s'", Truncated(query))
+        is_rag, contexts, retrieval_degraded = await self.rag_service.aretrieve_context(query, is_rag=is_rag)
+        contexts = self._log_context(query, is_rag, contexts)
+
+        with span("prompt.build"):
+            messages = self.prompt_builder.build(query, history, contexts)
+        self._log_messages(messages)
+        start_time = time.perf_counter()
+        response = await self.rag_service.async_client.chat.completions.create(
+            model=self.completion_model,
+            messages=messages,
+            stream=True,
+            store=True
+        )
+
+        partial_answer = []
+        stream_failed = False
+        try:
+            async for chunk in response:
+                chunk_text = chunk.choices[0].delta.content
+                if chunk_text:
+                    if not partial_answer:
+                        observe("openai.first_chunk", time.perf_counter() - start_time)
+                    partial_answer.append(chunk_text)
+                    yield chunk_text
+        except Exception as e:
+            stream_failed = True
+            logger.error(f"Streaming error: {e}")
+        observe("openai.stream", time.perf_counter() - start_time, "error" if stream_failed else "ok")
+
+        await asyncio.to_thread(self._finish_turn, session_id, query, history, partial_answer,
+                                stream_failed or retrieval_degraded)
+
+    def _cached_answer(self, query: str, history: list):
+        # Only history-free turns are cacheable: earlier turns change the answer
+        if history:
+            return None
+        return self.answer_cache.get(query)
+
+    def _log_context(self, query: str, is_rag: bool, contexts: list) -> list:
+        """
+        Log the retrieved contexts, or return the fallback context when nothing was retrieved.
+        """
+        if contexts:
+            logger.info("Retrieved %d contexts (%d chars)", len(contexts), sum(len(c) for c in contexts))
+            return contexts
+
+        logger.info("No RAG context used for query='%s' (is_rag=%s)", Truncated(query), is_rag)
+        return [
+            "No coffee documents retrieved for this question. "
+            "Respond using only your general knowledge."
+        ]
+
+    @staticmethod
+    def _log_messages(messages: list):
+        """
+        Dump the messages sent to OpenAI for a sampled fraction of requests, each one truncated.
+        """
+        if not dump_sampled(logger):
+            return
+        for msg in messages:
+            logger.info("Prompt %s: %s", msg["role"], Truncated(msg["content"]))
+
+    def _finish_turn(self, session_id: str, query: str, history: list, partial_answer: list, degraded: bool):
+        """
+        Remember the turn, and cache the answer unless it is partial or was built on a
+        degraded retrieval (timeouts or errors): caching it would serve that fallback
+        answer to every user for ANSWER_CACHE_TTL.
+        """
+        final_answer = "".join(partial_answer).strip()
+        self.remember_turn(session_id, query, final_answer)
+        if not history and not degraded:
+            self.answer_cache.set(query, final_answer)
+        logger.info("Final answer length=%d", len(final_answer))
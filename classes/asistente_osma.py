@@ -1,22 +1,17 @@
 # File: classes/asistente_osma.py
 
-import os
-import json
 import logging
 
+from classes.osma_catalog import get_catalog
+from classes.osma_search import get_search_index
+
 logger = logging.getLogger(__name__)
 
 
 class AsistenteOSMA:
     def __init__(self):
-        json_path = os.path.join(os.path.dirname(__file__), '..', 'osma_data.json')
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-            logger.info(f"Archivo de OSMA cargado desde: {json_path}")
-        except Exception as e:
-            logger.error(f"Error al cargar el archivo JSON de OSMA: {e}")
-            self.data = {}
+        # Catálogo compartido (cargado una vez por proceso)
+        self.catalogo = get_catalog()
 
         self.state = 0
         self.servicio = None          # Ahora será una lista de servicios seleccionados
@@ -33,6 +28,20 @@ class AsistenteOSMA:
             "¿Qué intervalo de consulta requiere? (Minuto, Hora, Día o Mes)"
         ]
 
+    # Campos del diálogo que se guardan en el session store (JSON, compartido entre workers)
+    CAMPOS_ESTADO = ("state", "servicio", "monitoreable", "variables", "rango_fechas", "intervalo")
+
+    def to_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_ESTADO}
+
+    @classmethod
+    def from_dict(cls, estado):
+        asistente = cls()
+        for campo in cls.CAMPOS_ESTADO:
+            if campo in estado:
+                setattr(asistente, campo, estado[campo])
+        return asistente
+
     def iniciar_dialogo(self):
         self.state = 0
         self.servicio = None
@@ -46,24 +55,25 @@ class AsistenteOSMA:
     def procesar_respuesta(self, respuesta):
         if self.state == 0:
             selected = [s.strip() for s in respuesta.split(',')]
-            valid = [s for s in selected if s in self.data.keys()]
+            valid = self._validar(selected, self.catalogo.monitoreables, "servicio")
             if not valid:
                 return "Ningún servicio válido seleccionado. Por favor, intente de nuevo."
             self.servicio = valid
         elif self.state == 1:
             selected = [s.strip() for s in respuesta.split(',')]
-            valid = []
-            for mon in selected:
-                for serv in self.servicio:
-                    if mon in self.data.get(serv, {}).keys():
-                        valid.append(mon)
-                        break
+            disponibles = set(self.catalogo.opciones_monitoreables(self.servicio))
+            valid = self._validar(selected, disponibles, "monitoreable", servicios=self.servicio)
             if not valid:
                 return "Monitoreable no encontrado para los servicios seleccionados. Intente nuevamente."
             self.monitoreable = valid
         elif self.state == 2:
             selected = [s.strip() for s in respuesta.split(',')]
-            self.variables = selected
+            disponibles = set(self.catalogo.opciones_variables(self.servicio, self.monitoreable))
+            valid = self._validar(selected, disponibles, "variable",
+                                  servicios=self.servicio, monitoreables=self.monitoreable)
+            if not valid:
+                return "Ninguna variable válida seleccionada. Intente nuevamente."
+            self.variables = valid
         elif self.state == 3:
             self.rango_fechas = respuesta  # Aquí se podría validar el formato
         elif self.state == 4:
@@ -75,6 +85,35 @@ class AsistenteOSMA:
         else:
             return self.finalizar_dialogo()
 
+    def _validar(self, nombres, disponibles, tipo, servicios=None, monitoreables=None):
+        """
+        Nombres válidos de la respuesta. Los que no coinciden exactamente se corrigen con el
+        índice de búsqueda (acentos, mayúsculas, errores de tipeo) cuando el resultado es claro.
+        """
+        valid = []
+        for nombre in nombres:
+            if nombre not in disponibles:
+                nombre = get_search_index().corregir(nombre, tipo, servicios, monitoreables)
+            if nombre in disponibles and nombre not in valid:
+                valid.append(nombre)
+        return valid
+
+    def opciones_paso_actual(self):
+        """
+        Devuelve las opciones del formulario correspondiente al estado actual
+        (monitoreables, variables o intervalos), o un diccionario vacío.
+        """
+        if self.state == 1:
+            # Paso 1: Monitoreables. Se agrupan de todos los servicios seleccionados.
+            return {"monitoreables": self.catalogo.opciones_monitoreables(self.servicio)}
+        elif self.state == 2:
+            # Paso 2: Variables.
+            return {"variables": self.catalogo.opciones_variables(self.servicio, self.monitoreable)}
+        elif self.state == 4:
+            # Paso 4: Intervalo; enviamos las opciones fijas
+            return {"intervals": ["Minuto", "Hora", "Día", "Mes"]}
+        return {}
+
     def finalizar_dialogo(self):
         resumen = (
             f"Configuración OSMA:\n"
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.RLock()
+        self._inflight = {}  # key -> lock held while the value is being computed
+        self._async_inflight = {}  # key -> asyncio task computing the value
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None or item[0] < time.monotonic():
+                return default
+            return item[1]
+
+    def update(self, key, fn, default=None):
+        """
+        Atomically replace the value stored under `key` with `fn(current_value)`.
+        """
+        with self._lock:
+            new_value = fn(self.get(key, default))
+            self.set(key, new_value)
+            return new_value
+
+    def get_or_set(self, key, fn, ttl_for=None):
+        """
+        Return the cached value for `key`, computing it with `fn()` on a miss.
+        Concurrent callers missing on the same key wait for a single computation.
+        `ttl_for(value)` may return a TTL for that value (None keeps the default).
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Another caller may have filled the entry while we were waiting
+                value = self.get(key, _MISSING)
+                if value is _MISSING:
+                    value = fn()
+                    self.set(key, value, None if ttl_for is None else ttl_for(value))
+                return value
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is key_lock:
+                    del self._inflight[key]
+
+    async def aget_or_set(self, key, coro_fn, ttl_for=None):
+        """
+        Async counterpart of get_or_set: `coro_fn()` returns an awaitable, and
+        concurrent coroutines missing on the same key await a single task.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._async_inflight.get(key)
+        if task is None:
+            async def _compute():
+                try:
+                    result = await coro_fn()
+                    self.set(key, result, None if ttl_for is None else ttl_for(result))
+                    return result
+                finally:
+                    self._async_inflight.pop(key, None)
+
+            task = asyncio.ensure_future(_compute())
+            self._async_inflight[key] = task
+        # Shield the shared task so one caller timing out does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] >= time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def thread_local_connection(local: threading.local, path: str) -> sqlite3.Connection:
+    """
+    Return the SQLite connection of the current thread and process, opening it on
+    first use. Connections are never shared across threads or across a fork.
+    """
+    conn = getattr(local, "conn", None)
+    if conn is None or local.pid != os.getpid():
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+        local.pid = os.getpid()
+    return conn
+
+
+class SQLiteCache:
+    """
+    On-disk cache of JSON values with expiry, shared by every worker on the host.
+    Entries carry a tag so groups of them can be invalidated together.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " tag TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_tag ON cache (tag)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return thread_local_connection(self._local, self.path)
+
+    def get(self, key: str, default=None):
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value, tag: str = "", ttl: float = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO cache (key, tag, value, expires_at) VALUES (?, ?, ?, ?)",
+            (key, tag, json.dumps(value, ensure_ascii=False), time.time() + (self.ttl if ttl is None else ttl))
+        )
+
+    def invalidate(self, tag: str = None):
+        """
+        Delete every entry with `tag`, or the whole cache when no tag is given.
+        """
+        conn = self._connect()
+        if tag is None:
+            conn.execute("DELETE FROM cache")
+        else:
+            conn.execute("DELETE FROM cache WHERE tag = ?", (tag,))
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+
+class TwoLevelCache:
+    """
+    In-process TTLCache in front of a shared SQLiteCache. The in-process level uses
+    a short TTL so that invalidations made by another worker are picked up quickly.
+    """
+
+    def __init__(self, disk: SQLiteCache, maxsize: int = 5000, memory_ttl: float = 300):
+        self.memory = TTLCache(maxsize=maxsize, ttl=memory_ttl)
+        self.disk = disk
+
+    def _memory_ttl(self, ttl_for):
+        # A value with its own TTL never outlives it in memory either
+        if ttl_for is None:
+            return None
+
+        def _ttl(value):
+            ttl = ttl_for(value)
+            return None if ttl is None else min(ttl, self.memory.ttl)
+        return _ttl
+
+    def get_or_set(self, key: str, fn, tag: str = "", ttl_for=None):
+        """
+        `ttl_for(value)` may give a value its own TTL (None keeps the defaults, 0 skips the disk).
+        """
+        def _load():
+            value = self.disk.get(key, _MISSING)
+            if value is _MISSING:
+                value = fn()
+                ttl = None if ttl_for is None else ttl_for(value)
+                if ttl is None or ttl > 0:
+                    self.disk.set(key, value, tag=tag, ttl=ttl)
+            return value
+
+        return self.memory.get_or_set(key, _load, ttl_for=self._memory_ttl(ttl_for))
+
+    async def aget_or_set(self, key: str, coro_fn, tag: str = "", ttl_for=None):
+        async def _load():
+            value = await asyncio.to_thread(self.disk.get, key, _MISSING)
+            if value is _MISSING:
+                value = await coro_fn()
+                ttl = None if ttl_for is None else ttl_for(value)
+                if ttl is None or ttl > 0:
+                    await asyncio.to_thread(self.disk.set, key, value, tag, ttl)
+            return value
+
+        return await self.memory.aget_or_set(key, _load, ttl_for=self._memory_ttl(ttl_for))
+
+    def invalidate(self, tag: str = None):
+        self.memory.clear()
+        self.disk.invalidate(tag)
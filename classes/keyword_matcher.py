@@ -0,0 +1,66 @@
+import re
+
+from classes.text_utils import fold_accents
+
+STEM_MARKER = "*"
+
+
+class KeywordMatcher:
+    """
+    Finds keywords in a text with a single compiled regular expression.
+
+    Keywords are accent-folded and lower-cased, and always match on word
+    boundaries. A plain keyword matches the whole word or its plural ("grano"
+    matches "granos"), a keyword ending in "*" is a stem ("tost*" matches
+    "tostado", "tostadora"...), and multi-word keywords are phrases matched
+    across any whitespace. The alternation is built from a prefix trie, so
+    the regex engine never re-scans shared prefixes and matching stays linear
+    in the length of the text.
+    """
+
+    def __init__(self, keywords):
+        trie = {}
+        for keyword in keywords:
+            term = fold_accents(keyword).lower().strip()
+            is_stem = term.endswith(STEM_MARKER)
+            term = " ".join(term.rstrip(STEM_MARKER).split())
+            if not term:
+                continue
+            node = trie
+            for char in term:
+                node = node.setdefault(char, {})
+            # Stems win over whole words when the same term appears both ways
+            node[""] = "stem" if is_stem or node.get("") == "stem" else "word"
+
+        self.size = len(keywords)
+        self.pattern = None
+        if trie:
+            self.pattern = re.compile(r"(?<!\w)" + self._trie_to_regex(trie) + r"(?!\w)")
+
+    @classmethod
+    def _trie_to_regex(cls, node) -> str:
+        branches = []
+        for char, child in sorted(node.items()):
+            if char == "":
+                continue
+            token = r"\s+" if char == " " else re.escape(char)
+            branches.append(token + cls._trie_to_regex(child))
+
+        end = node.get("")
+        if end == "stem":
+            branches.append(r"\w*")
+        elif end == "word":
+            branches.append(r"(?:e?s)?")
+
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    def find(self, text: str):
+        """
+        Return the first keyword occurrence in `text` (accent-folded), or None.
+        """
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(fold_accents(text).lower())
+        return match.group(0) if match else None
@@ -0,0 +1,248 @@
+import os
+import json
+import math
+import zlib
+import logging
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from classes.text_utils import normalize_query
+from classes.resources import shared
+
+logger = logging.getLogger(__name__)
+
+# Directory written by build_local_index.py; buckets found there are searched locally first
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "local_index")
+# Weight of BM25 against the embedding similarity in the hybrid score
+LOCAL_INDEX_ALPHA = float(os.getenv("LOCAL_INDEX_ALPHA", 0.6))
+# Hybrid score (0-1) the best local chunk needs before GroundX is skipped
+LOCAL_INDEX_MIN_SCORE = float(os.getenv("LOCAL_INDEX_MIN_SCORE", 0.35))
+
+INDEX_VERSION = 1
+EMBEDDING_DIM = 256
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Function words of both corpus languages; they carry no retrieval signal
+STOPWORDS = frozenset("""
+    el la los las un una unos unas de del al y e o u a en con por para sin sobre entre que cual cuales
+    como cuando donde quien es son ser esta estan fue se su sus lo le les mi me te tu nos mas muy ya
+    pero si no hay este esta estos estas ese esa eso the an of and or to in on at by for with from
+    is are was were be been it its this that these those as what which how when who can do does
+""".split())
+
+Hit = namedtuple("Hit", "chunk score bm25 cosine")
+
+_FILES = ("term_offsets", "post_chunks", "post_tf", "idf", "chunk_len", "chunk_doc", "chunk_page",
+          "chunk_bucket", "embeddings", "embedding_scale", "text_offsets", "texts")
+
+
+def tokenize(text: str) -> list:
+    return [t for t in normalize_query(text).split() if len(t) > 1 and t not in STOPWORDS]
+
+
+def embed(tokens: list, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Hashed embedding: signed feature hashing of each word and of its character
+    trigrams (so "tostado" and "tostar" land close together), L2-normalized.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokens:
+        padded = f"<{token}>"
+        features = [token] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            # crc32 is stable across processes, unlike hash()
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def quantize(matrix: np.ndarray):
+    """
+    Symmetric int8 quantization per row: returns (int8 matrix, float32 scale per row).
+    """
+    scale = np.abs(matrix).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.round(matrix / scale[:, None]).astype(np.int8)
+    return quantized, scale.astype(np.float32)
+
+
+def _chunk_words(words: list, size: int, overlap: int):
+    step = max(size - overlap, 1)
+    for start in range(0, max(len(words) - overlap, 1), step):
+        yield words[start:start + size]
+
+
+def build_local_index(documents, output_dir: str = LOCAL_INDEX_PATH, chunk_words: int = 180,
+                      overlap: int = 40, dim: int = EMBEDDING_DIM) -> dict:
+    """
+    Chunk `documents` (dicts with title, text, bucket_id and an optional page) and
+    write the BM25 postings, int8 embeddings and chunk texts as .npy files that the
+    server memory-maps. Returns the metadata written to meta.json.
+    """
+    titles, chunks = [], []  # chunks: (document index, page, text)
+    for document in documents:
+        titles.append({"title": document["title"], "bucket_id": int(document["bucket_id"])})
+        words = document["text"].split()
+        for part in _chunk_words(words, chunk_words, overlap):
+            if part:
+                chunks.append((len(titles) - 1, int(document.get("page") or 0), " ".join(part)))
+    if not chunks:
+        raise ValueError("No text to index.")
+
+    postings = {}
+    lengths, vectors = [], []
+    for chunk_id, (_, _, text) in enumerate(chunks):
+        tokens = tokenize(text)
+        lengths.append(len(tokens))
+        vectors.append(embed(tokens, dim))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((chunk_id, tf))
+
+    terms = sorted(postings)
+    n_chunks = len(chunks)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    post_chunks, post_tf, idf = [], [], np.zeros(len(terms), dtype=np.float32)
+    for i, term in enumerate(terms):
+        entries = postings[term]
+        offsets[i + 1] = offsets[i] + len(entries)
+        post_chunks.extend(c for c, _ in entries)
+        post_tf.extend(min(tf, 65535) for _, tf in entries)
+        idf[i] = math.log(1.0 + (n_chunks - len(entries) + 0.5) / (len(entries) + 0.5))
+
+    encoded = [text.encode("utf-8") for _, _, text in chunks]
+    text_offsets = np.zeros(n_chunks + 1, dtype=np.int64)
+    text_offsets[1:] = np.cumsum([len(b) for b in encoded])
+    embeddings, embedding_scale = quantize(np.vstack(vectors))
+
+    arrays = {
+        "term_offsets": offsets,
+        "post_chunks": np.asarray(post_chunks, dtype=np.int32),
+        "post_tf": np.asarray(post_tf, dtype=np.uint16),
+        "idf": idf,
+        "chunk_len": np.asarray(lengths, dtype=np.int32),
+        "chunk_doc": np.asarray([d for d, _, _ in chunks], dtype=np.int32),
+        "chunk_page": np.asarray([p for _, p, _ in chunks], dtype=np.int32),
+        "chunk_bucket": np.asarray([titles[d]["bucket_id"] for d, _, _ in chunks], dtype=np.int64),
+        "embeddings": embeddings,
+        "embedding_scale": embedding_scale,
+        "text_offsets": text_offsets,
+        "texts": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f"{name}.npy"), array)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "dim": dim,
+        "n_chunks": n_chunks,
+        "avg_len": float(np.mean(lengths)) or 1.0,
+        "documents": titles,
+        "buckets": sorted({d["bucket_id"] for d in titles}),
+        "terms": terms,
+    }
+    # meta.json last: a half-written index is never picked up
+    with open(os.path.join(output_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+class LocalIndex:
+    """
+    Read-only hybrid index over the coffee documents: BM25 over words plus cosine
+    similarity of int8-quantized hashed embeddings. Every array is memory-mapped,
+    so workers share the pages and loading costs no more than reading meta.json.
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_PATH, alpha: float = LOCAL_INDEX_ALPHA):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported local index version {meta.get('version')} in {path}")
+        for name in _FILES:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        self.dim = meta["dim"]
+        self.n_chunks = meta["n_chunks"]
+        self.avg_len = meta["avg_len"]
+        self.documents = meta["documents"]
+        self.buckets = frozenset(meta["buckets"])
+        self.term_ids = {term: i for i, term in enumerate(meta["terms"])}
+        self.alpha = alpha
+        # A query word absent from the corpus counts as a rare, unmatched term
+        self.unknown_idf = math.log(1.0 + (self.n_chunks + 0.5) / 0.5)
+
+    def mirrors(self, bucket_id) -> bool:
+        return bucket_id in self.buckets
+
+    def search(self, query: str, bucket_id=None, n: int = 5) -> list:
+        """
+        Best `n` chunks for `query` (optionally within one bucket), by hybrid score.
+        BM25 is divided by the score of a chunk matching every query term, so both
+        parts of the score, and the score itself, lie between 0 and 1.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        bm25 = np.zeros(self.n_chunks, dtype=np.float32)
+        best_possible = 0.0
+        for term in set(tokens):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                best_possible += self.unknown_idf * (BM25_K1 + 1)
+                continue
+            idf = float(self.idf[term_id])
+            best_possible += idf * (BM25_K1 + 1)
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            chunks = self.post_chunks[start:end]
+            tf = self.post_tf[start:end].astype(np.float32)
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_len[chunks] / self.avg_len)
+            bm25[chunks] += idf * tf * (BM25_K1 + 1) / (tf + length_norm)
+        bm25 /= best_possible
+
+        query_vector = embed(tokens, self.dim)
+        cosine = (self.embeddings @ query_vector) * self.embedding_scale
+        scores = self.alpha * bm25 + (1 - self.alpha) * np.maximum(cosine, 0)
+        if bucket_id is not None:
+            scores[self.chunk_bucket != bucket_id] = -1.0
+
+        n = min(n, self.n_chunks)
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return [Hit(int(c), float(scores[c]), float(bm25[c]), float(cosine[c])) for c in top if scores[c] > 0]
+
+    def chunk_text(self, chunk: int) -> str:
+        return bytes(self.texts[self.text_offsets[chunk]:self.text_offsets[chunk + 1]]).decode("utf-8")
+
+    def format(self, hits: list) -> str:
+        """
+        Context text for the prompt: each chunk under its document title and page,
+        so the answer can cite them like GroundX results.
+        """
+        parts = []
+        for hit in hits:
+            title = self.documents[self.chunk_doc[hit.chunk]]["title"]
+            page = int(self.chunk_page[hit.chunk])
+            source = f"{title}, página {page}" if page else title
+            parts.append(f"[Documento: {source}]\n{self.chunk_text(hit.chunk)}")
+        return "\n\n".join(parts)
+
+
+def _load_local_index():
+    if not os.path.exists(os.path.join(LOCAL_INDEX_PATH, "meta.json")):
+        logger.info(f"No local index at {LOCAL_INDEX_PATH}, every bucket search goes to GroundX.")
+        return False
+    index = LocalIndex(LOCAL_INDEX_PATH)
+    logger.info(f"Loaded local index from {LOCAL_INDEX_PATH}: {index.n_chunks} chunks, buckets {sorted(index.buckets)}")
+    return index
+
+
+def get_local_index():
+    """
+    Local index shared by the process, or None when it has not been built.
+    """
+    # False marks "looked for it and found nothing", so the directory is not checked again
+    return shared("local_index", _load_local_index) or None
@@ -0,0 +1,90 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+from classes.tracing import sampled
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+# Fraction of requests that log their full prompt/context (0 = never, 1 = always)
+LOG_DUMP_SAMPLE_RATE = float(os.getenv("LOG_DUMP_SAMPLE_RATE", 0.01))
+# Large payloads (contexts, messages, answers) are cut to this many characters
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", 500))
+
+_stream_handler = None
+_queue_handler = None
+_listener = None
+
+
+class Truncated:
+    """
+    Lazy log argument: the payload is only converted and cut if the record is emitted.
+    """
+    __slots__ = ("payload", "max_chars")
+
+    def __init__(self, payload, max_chars: int = LOG_MAX_CHARS):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self):
+        text = str(self.payload)
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} more chars]"
+
+
+def dump_sampled(logger: logging.Logger) -> bool:
+    """
+    Whether this request logs its full prompt/context (see LOG_DUMP_SAMPLE_RATE).
+    """
+    return logger.isEnabledFor(logging.INFO) and sampled(LOG_DUMP_SAMPLE_RATE)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The queue never leaves the process, so records are formatted by the listener
+    # thread instead of the request thread
+    def prepare(self, record):
+        return record
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, _stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """
+    Send every log record through a queue to a background thread that formats and
+    writes it, so serving threads never block on log I/O. Output is UTF-8 on stderr,
+    with unencodable characters replaced. Safe to call more than once.
+    """
+    global _stream_handler, _queue_handler
+    if _queue_handler is not None:
+        return
+
+    stream = open(sys.stderr.fileno(), "w", encoding="utf-8", errors="replace", buffering=1, closefd=False)
+    _stream_handler = logging.StreamHandler(stream)
+    _stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _queue_handler = _DeferredQueueHandler(None)
+    _start_listener()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    # Pending records are flushed on exit; forked workers (gunicorn --preload) need their own thread
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_start_listener)
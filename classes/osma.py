@@ -1,19 +1,92 @@
-import boto3
-import requests
+import os
 import json
+import itertools
+import threading
+from collections import deque
 from dateutil.relativedelta import relativedelta
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from classes.osma_transport import get_default_transport
+from classes.osma_token import LOGIN_ERRORS, get_token_manager, token_expiry, credentials_key
+from classes.osma_series_cache import get_default_series_cache
+from classes.osma_series import OsmaSeries, intervalos_mas_finos
+from classes.tracing import span
+from classes.resources import shared
+
+# Endpoints de OSMA; configurables para apuntar a otro entorno (p. ej. bench/fake_servers.py)
+OSMA_LOGIN_URL = os.getenv("OSMA_LOGIN_URL", "https://mrb5y4lp39.execute-api.us-east-1.amazonaws.com/api/login")
+OSMA_AURORA_URL = os.getenv("OSMA_AURORA_URL", "https://n7ry336c1g.execute-api.us-east-1.amazonaws.com/latest/getDatosAurora")
+OSMA_ENERGY_URL = os.getenv("OSMA_ENERGY_URL", "https://27xakwexw4.execute-api.us-east-1.amazonaws.com/latest/getDatosEnergy")
+# Tramos descargándose a la vez en todo el proceso, sumando consultas, variables y exportaciones concurrentes
+OSMA_CHUNK_WORKERS = int(os.getenv("OSMA_CHUNK_WORKERS", 16))
+
+
+def get_chunk_executor():
+    """
+    Pool de descarga de tramos compartido por el proceso: las variables de una consulta
+    (ya en paralelo) y las consultas concurrentes se reparten sus hilos, en vez de crear
+    un pool nuevo por variable.
+    """
+    return shared("osma_chunk_executor", lambda: ThreadPoolExecutor(
+        max_workers=OSMA_CHUNK_WORKERS, thread_name_prefix="osma-chunk"))
+
+
+def get_request_slots():
+    """
+    Semáforo del proceso: como mucho OSMA_CHUNK_WORKERS pedidos de datos a OSMA en vuelo,
+    se hagan desde el pool de tramos o desde el hilo que llama (rangos de un solo tramo).
+    """
+    return shared("osma_request_slots", lambda: threading.BoundedSemaphore(OSMA_CHUNK_WORKERS))
+
 
 class Osma:
 
-    def __init__(self, region='us-east-1', profile_name='default'):
+    # Tramo máximo por request según el intervalo, para no superar los límites de respuesta de la API
+    CHUNK_SPANS = {
+        "MIN": relativedelta(days=7),
+        "HOUR": relativedelta(months=3),
+        "DAY": relativedelta(years=2),
+        "MONTH": relativedelta(years=10),
+    }
+    # Tramos en vuelo por llamada a iterDatosVariable, dentro del pool compartido
+    MAX_PARALLEL_CHUNKS = 8
+    # Cantidad de timestamps finales de un tramo que se comparan con el inicio del siguiente
+    BOUNDARY_OVERLAP = 5
+
+    def __init__(self, region='us-east-1', profile_name='default', transport=None, cache=None, useCache=True):
         self.region = region
         self.profile_name = profile_name
         self.accessToken = None
+        self.user = None
+        self.pwd = None
+        # Transporte HTTP con pool de conexiones, timeouts y reintentos (compartido por defecto)
+        self.transport = transport or get_default_transport()
+        # Cache local de series: sólo se piden a la API los tramos que faltan
+        self.cache = (cache or get_default_series_cache()) if useCache else None
 
-    def authenticate_and_get_access_token_via_api(self, username, password):
+    def latencyStats(self):
+        return self.transport.stats()
 
-        url = "https://mrb5y4lp39.execute-api.us-east-1.amazonaws.com/api/login"
+    def authenticate_and_get_access_token_via_api(self, username, password):
+        # El token se comparte en el proceso: sólo se hace login si no hay uno vigente
+        self.user = username
+        self.pwd = password
+        try:
+            self.accessToken = self.getAccessToken()
+        except LOGIN_ERRORS:
+            # El gestor ya registró el error; cualquier otra excepción es un bug y se propaga
+            self.accessToken = None
+            return False
+        return self.accessToken != None
+
+    def loginViaApi(self, username, password):
+        """
+        Login contra la API; devuelve (token, vencimiento en segundos epoch).
+        """
+        url = OSMA_LOGIN_URL
         payload = json.dumps({
             "username": username,
             "password": password
@@ -22,23 +95,35 @@ class Osma:
             'Content-Type': 'application/json'
         }
 
-        response = requests.request("POST", url, headers=headers, data=payload)
-        self.user = username
-        self.pwd = password
-        # print("Log in success")
-        # print("Access token:", resp['AuthenticationResult']['AccessToken'])
-        # print("ID token:", resp['AuthenticationResult']['IdToken'])
+        response = self.transport.request("POST", url, headers=headers, data=payload)
         resp = json.loads(response.text)
-        if resp['statusCode'] == 200:
-            self.accessToken = resp['body']['AccessToken']
-            return self.accessToken != None
-
-        return False
-        # return resp['AuthenticationResult']['AccessToken']!=None
+        if resp['statusCode'] != 200 or not resp['body'].get('AccessToken'):
+            raise ValueError(f"Login OSMA rechazado (statusCode {resp['statusCode']})")
+        token = resp['body']['AccessToken']
+        return token, token_expiry(token, resp['body'].get('ExpiresIn'))
+
+    def getAccessToken(self):
+        # Con credenciales, el token vigente lo da el gestor compartido (renovado en segundo plano)
+        if self.user is None:
+            return self.accessToken
+        return get_token_manager().get_token(
+            credentials_key(self.user, self.pwd), lambda: self.loginViaApi(self.user, self.pwd))
+
+    def requestConToken(self, url):
+        """
+        GET autenticado; si la API rechaza el token, se descarta y se reintenta una vez con uno nuevo.
+        """
+        response = self.transport.request("GET", url, headers={'user_token': self.getAccessToken()}, data={})
+        if response.status_code in (401, 403) and self.user is not None:
+            get_token_manager().invalidate(credentials_key(self.user, self.pwd))
+            response = self.transport.request("GET", url, headers={'user_token': self.getAccessToken()}, data={})
+        return response
 
     def authenticate_and_get_access_token(self, username, password):
 
     # client = boto3.client('cognito-idp',region_name=REGION)
+            # boto3 sólo hace falta para este login legado vía Cognito: se importa recién aquí
+            import boto3
             client = boto3.session.Session(profile_name='default').client('cognito-idp', region_name=REGION)
 
             resp = client.admin_initiate_auth(
@@ -68,15 +153,10 @@ class Osma:
         horaInicio = fechaInicio.strftime("%H:%M")
         horaFin = fechaFin.strftime("%H:%M")
 
-        url = "https://27xakwexw4.execute-api.us-east-1.amazonaws.com/latest/getDatosEnergy/%d/%s/%s/%s/%s/%s/TRUE/" % (
+        url = OSMA_ENERGY_URL + "/%d/%s/%s/%s/%s/%s/TRUE/" % (
             idVariable, dateInicio, dateFin, interval, horaInicio, horaFin)
 
-        payload = {}
-        headers = {
-            'user_token': self.accessToken
-        }
-
-        response = requests.request("GET", url, headers=headers, data=payload)
+        response = self.requestConToken(url)
 
         jsonData = response.json()
 
@@ -88,37 +168,118 @@ class Osma:
             return varData
         return None
 
+    def splitRange(self, fechaInicio, fechaFin, interval, monthInterval=-1):
+        # Tramos [inicio, fin] consecutivos; el fin de cada tramo es el inicio del siguiente
+        if monthInterval >= 1:
+            step = relativedelta(months=monthInterval)
+        else:
+            step = self.CHUNK_SPANS.get(interval, relativedelta(months=1))
+
+        ranges = []
+        fini = fechaInicio
+        while fini < fechaFin:
+            ffin = min(fini + step, fechaFin)
+            ranges.append((fini, ffin))
+            fini = ffin
+        return ranges or [(fechaInicio, fechaFin)]
+
+    def iterDatosVariable(self, idVariable, fechaInicio, fechaFin, interval,
+                          monthInterval=-1, maxWorkers=None):
+        """
+        Descarga el rango en tramos concurrentes (como mucho `maxWorkers` en vuelo, en el
+        pool compartido) y devuelve cada tramo en orden cronológico apenas él y todos los
+        anteriores están disponibles.
+        Los timestamps repetidos en los bordes de los tramos se devuelven una sola vez.
+        """
+        tramos = iter(self.splitRange(fechaInicio, fechaFin, interval, monthInterval))
+        executor = get_chunk_executor()
+
+        def _pedir(fini, ffin):
+            return executor.submit(self.getDatosVariableNotDivided, idVariable, fini, ffin, interval)
+
+        ventana = maxWorkers or self.MAX_PARALLEL_CHUNKS
+        pendientes = deque(_pedir(*tramo) for tramo in itertools.islice(tramos, ventana))
+        try:
+            previousTail = set()
+            while pendientes:
+                future = pendientes.popleft()
+                siguiente = next(tramos, None)
+                if siguiente is not None:
+                    pendientes.append(_pedir(*siguiente))
+                chunk = future.result()
+                if chunk is None or not chunk['date']:
+                    continue
+
+                # Quitar el borde compartido con el tramo anterior
+                skip = 0
+                while skip < len(chunk['date']) and chunk['date'][skip] in previousTail:
+                    skip += 1
+                if skip:
+                    chunk['date'] = chunk['date'][skip:]
+                    chunk['values'] = chunk['values'][skip:]
+                if not chunk['date']:
+                    continue
+
+                previousTail = set(chunk['date'][-self.BOUNDARY_OVERLAP:])
+                yield chunk
+        finally:
+            # Cancelar los tramos pendientes si el consumidor deja de iterar
+            for future in pendientes:
+                future.cancel()
+
     def getDatosVariable(self, idVariable, fechaInicio, fechaFin, interval,
                          monthInterval=-1):
-
-        if monthInterval < 1:
+        if self.cache is None:
+            return self.descargarDatosVariable(idVariable, fechaInicio, fechaFin, interval, monthInterval)
+
+        huecos = self.cache.faltantes(idVariable, interval, fechaInicio, fechaFin)
+        descargado = not huecos
+        for gapInicio, gapFin in huecos:
+            datos = self.descargarDatosVariable(idVariable, gapInicio, gapFin, interval, monthInterval)
+            if datos is not None:
+                self.cache.guardar(idVariable, interval, gapInicio, gapFin, datos)
+                descargado = True
+
+        allData = self.cache.cargar(idVariable, interval, fechaInicio, fechaFin)
+        if not allData['date'] and not descargado:
+            return None
+        return allData
+
+    def getSerie(self, idVariable, fechaInicio, fechaFin, interval, agregacion=None,
+                 monthInterval=-1):
+        """
+        Devuelve la variable como OsmaSeries. Con `agregacion` (opcional), si el rango no está
+        en cache para `interval` pero sí completo en un intervalo más fino, se agrega localmente
+        sin llamar a la API; sin ella se usan siempre los valores de la API para `interval`.
+        """
+        if agregacion is not None and self.cache is not None \
+                and self.cache.faltantes(idVariable, interval, fechaInicio, fechaFin):
+            for fino in intervalos_mas_finos(interval):
+                if not self.cache.faltantes(idVariable, fino, fechaInicio, fechaFin):
+                    datos = self.cache.cargar(idVariable, fino, fechaInicio, fechaFin)
+                    serie = OsmaSeries.from_api(datos['date'], datos['values'], datos['variable'])
+                    return serie.resample(interval, agregacion)
+
+        datos = self.getDatosVariable(idVariable, fechaInicio, fechaFin, interval, monthInterval)
+        if datos is None:
+            return None
+        return OsmaSeries.from_api(datos['date'], datos['values'], datos.get('variable'))
+
+    def descargarDatosVariable(self, idVariable, fechaInicio, fechaFin, interval,
+                               monthInterval=-1):
+
+        ranges = self.splitRange(fechaInicio, fechaFin, interval, monthInterval)
+        if len(ranges) == 1:
             return self.getDatosVariableNotDivided(idVariable, fechaInicio, fechaFin, interval)
-        else:
-            allData = None
-            fini = fechaInicio
-
-            while True:
-                ffin = fechaFin
-                fendTemp = fini + relativedelta(months=monthInterval)
-
-                if fendTemp < ffin:
-                    ffin = fendTemp
-
-                response = self.getDatosVariableNotDivided(idVariable, fini, ffin, interval)
 
-                if response != None:
-                    if allData == None:
-                        allData = response
-                    else:
-                        allData['values'].extend(response['values'])
-                        allData['date'].extend(response['date'])
+        tramos = list(self.iterDatosVariable(idVariable, fechaInicio, fechaFin, interval, monthInterval))
+        if not tramos:
+            return None
 
-                fini = fendTemp
-
-                if fendTemp >= fechaFin:
-                    break
-
-            return allData
+        allData = tramos[0]
+        allData['date'] = [fecha for tramo in tramos for fecha in tramo['date']]
+        allData['values'] = np.concatenate([tramo['values'] for tramo in tramos])
+        return allData
 
     def getDatosVariableNotDivided(self, idVariable, fechaInicio, fechaFin, interval):
         dateInicio = fechaInicio.strftime("%Y-%m-%d")
@@ -126,23 +287,18 @@ class Osma:
         horaInicio = fechaInicio.strftime("%H:%M")
         horaFin = fechaFin.strftime("%H:%M")
 
-        url = "https://n7ry336c1g.execute-api.us-east-1.amazonaws.com/latest/getDatosAurora/%d/%s/%s/%s/%s/%s/TRUE/" % (
+        url = OSMA_AURORA_URL + "/%d/%s/%s/%s/%s/%s/TRUE/" % (
             idVariable, dateInicio, dateFin, interval, horaInicio, horaFin)
 
-        payload = {}
-        headers = {
-            'user_token': self.accessToken
-        }
-
-        response = requests.request("GET", url, headers=headers, data=payload)
-
-        jsonData = response.json()
+        with get_request_slots(), span("osma.fetch_chunk"):
+            response = self.requestConToken(url)
+            jsonData = response.json()
 
         if 'result' in jsonData and jsonData['result']['status'] == "OK":
             varData = {}
             varData['date'] = jsonData['result']['dateTime']
-            varData['values'] = jsonData['result']['values']
-            varData['values'] = [float(i) for i in varData['values']]
+            # Valores (texto o número) como float64 en una sola conversión; null queda NaN
+            varData['values'] = np.asarray(jsonData['result']['values'], dtype=float)
             varData['variable'] = jsonData['result']['variable']
             return varData
         return None
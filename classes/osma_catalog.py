@@ -0,0 +1,126 @@
+# File: classes/osma_catalog.py
+
+import os
+import json
+import logging
+import threading
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+OSMA_CATALOG_PATH = os.getenv(
+    "OSMA_CATALOG_PATH", os.path.join(os.path.dirname(__file__), '..', 'osma_data.json'))
+
+
+class OsmaCatalog:
+    """
+    Índices inmutables sobre osma_data.json, construidos una sola vez:
+      - servicio -> monitoreables
+      - (servicio, monitoreable) -> variables
+      - nombre de variable -> idVariables
+      - idVariable -> (servicio, monitoreable, variable)
+    Se comparte entre sesiones e hilos; nunca se modifica después de construirse.
+    """
+
+    def __init__(self, data: dict):
+        monitoreables = {}
+        variables = {}
+        ids_por_nombre = {}
+        rutas = {}
+        servicios_por_monitoreable = {}
+        for serv, mons in data.items():
+            monitoreables[serv] = tuple(mons.keys())
+            for mon, var_items in mons.items():
+                servicios_por_monitoreable.setdefault(mon, set()).add(serv)
+                nombres = []
+                for var_item in var_items:
+                    nombre = var_item.get("Variable")
+                    id_variable = int(var_item["idVariable"])
+                    nombres.append((nombre, id_variable))
+                    ids_por_nombre.setdefault(nombre, []).append(id_variable)
+                    rutas[id_variable] = (serv, mon, nombre)
+                variables[(serv, mon)] = MappingProxyType(dict(nombres))
+
+        self.servicios = tuple(data.keys())
+        self.monitoreables = MappingProxyType(monitoreables)
+        self.variables = MappingProxyType(variables)
+        self.ids_por_nombre = MappingProxyType({k: tuple(v) for k, v in ids_por_nombre.items()})
+        self.rutas = MappingProxyType(rutas)
+        self.servicios_por_monitoreable = MappingProxyType(
+            {k: frozenset(v) for k, v in servicios_por_monitoreable.items()})
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def opciones_monitoreables(self, servicios):
+        """
+        Monitoreables de los servicios seleccionados, sin repetir y en el orden del catálogo.
+        """
+        return list(dict.fromkeys(mon for serv in servicios for mon in self.monitoreables.get(serv, ())))
+
+    def opciones_variables(self, servicios, monitoreables):
+        """
+        Variables de los pares (servicio, monitoreable) seleccionados, sin repetir.
+        """
+        return list(dict.fromkeys(
+            nombre
+            for serv in servicios
+            for mon in monitoreables
+            for nombre in self.variables.get((serv, mon), ())
+        ))
+
+    def resolver(self, servicios, monitoreables, variables):
+        """
+        Ternas (servicio, monitoreable, variable) seleccionadas con su idVariable.
+        """
+        seleccion = []
+        for serv in servicios:
+            for mon in monitoreables:
+                disponibles = self.variables.get((serv, mon))
+                if not disponibles:
+                    continue
+                for nombre in variables:
+                    if nombre in disponibles:
+                        seleccion.append({
+                            "servicio": serv,
+                            "monitoreable": mon,
+                            "variable": nombre,
+                            "idVariable": disponibles[nombre],
+                        })
+        return seleccion
+
+
+_catalog = None
+_catalog_version = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(path: str = OSMA_CATALOG_PATH) -> OsmaCatalog:
+    """
+    Catálogo compartido por el proceso. Se vuelve a construir sólo si el archivo cambió
+    (fecha de modificación o tamaño); un error de lectura conserva el catálogo anterior.
+    """
+    global _catalog, _catalog_version
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError as e:
+        if _catalog is None:
+            logger.error(f"Error al cargar el archivo JSON de OSMA: {e}")
+            _catalog = OsmaCatalog({})
+        return _catalog
+
+    if version != _catalog_version:
+        with _catalog_lock:
+            if version != _catalog_version:
+                try:
+                    _catalog = OsmaCatalog.from_file(path)
+                    logger.info(f"Archivo de OSMA cargado desde: {path}")
+                except Exception as e:
+                    logger.error(f"Error al cargar el archivo JSON de OSMA: {e}")
+                    if _catalog is None:
+                        _catalog = OsmaCatalog({})
+                _catalog_version = version
+    return _catalog
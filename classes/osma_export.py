@@ -0,0 +1,167 @@
+# File: classes/osma_export.py
+
+import io
+import os
+import csv
+import logging
+import itertools
+from collections import deque
+
+from classes.osma import get_chunk_executor
+from classes.osma_series import valores_a_lista
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # La exportación Parquet queda deshabilitada
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Tramos en vuelo por exportación, dentro del pool de tramos compartido; acota su memoria
+OSMA_EXPORT_WORKERS = int(os.getenv("OSMA_EXPORT_WORKERS", 8))
+# Filas mínimas por row group de Parquet
+OSMA_EXPORT_ROW_GROUP = int(os.getenv("OSMA_EXPORT_ROW_GROUP", 50000))
+
+COLUMNAS = ["fecha", "servicio", "monitoreable", "variable", "idVariable", "valor"]
+FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportacionIncompleta(RuntimeError):
+    """
+    Un tramo no se pudo descargar: la exportación se corta en lugar de omitirlo.
+    """
+
+
+def parquet_disponible() -> bool:
+    return pq is not None
+
+
+def iter_filas(osma, seleccion, fecha_inicio, fecha_fin, intervalo, workers=OSMA_EXPORT_WORKERS):
+    """
+    Genera lotes de filas (fecha, servicio, monitoreable, variable, idVariable, valor),
+    variable por variable y tramo por tramo en orden cronológico. Los tramos se descargan
+    en el pool compartido del proceso; como mucho `workers` están en vuelo o esperando a
+    ser consumidos, sin importar el largo del rango.
+    Si un tramo falla se lanza ExportacionIncompleta: la respuesta ya empezó, así que la
+    conexión se corta sin cerrar el archivo y el cliente ve la descarga como fallida.
+    """
+    tareas = ((item, fini, ffin)
+              for item in seleccion
+              for fini, ffin in osma.splitRange(fecha_inicio, fecha_fin, intervalo))
+
+    def _descargar(item, fini, ffin):
+        # Un tramo (o un hueco dentro de él) es un solo pedido: no vuelve a usar el pool
+        return osma.getDatosVariable(item["idVariable"], fini, ffin, intervalo)
+
+    executor = get_chunk_executor()
+    pendientes = deque()
+    try:
+        for tarea in itertools.islice(tareas, workers):
+            pendientes.append((tarea, executor.submit(_descargar, *tarea)))
+
+        ultima = {}
+        while pendientes:
+            (item, fini, ffin), futuro = pendientes.popleft()
+            siguiente = next(tareas, None)
+            if siguiente is not None:
+                pendientes.append((siguiente, executor.submit(_descargar, *siguiente)))
+
+            try:
+                datos = futuro.result()
+            except Exception as e:
+                logger.error(f"Exportación: error en la variable {item['idVariable']} ({fini} - {ffin}): {e}")
+                raise ExportacionIncompleta(
+                    f"No se pudo descargar la variable {item['idVariable']} ({fini} - {ffin})") from e
+            if datos is None:
+                continue
+
+            # Los tramos comparten el borde: no repetir timestamps ya emitidos
+            desde = ultima.get(item["idVariable"])
+            filas = [
+                (fecha, item["servicio"], item["monitoreable"], item["variable"], item["idVariable"], valor)
+                for fecha, valor in zip(datos["date"], valores_a_lista(datos["values"]))
+                if desde is None or fecha > desde
+            ]
+            if filas:
+                ultima[item["idVariable"]] = filas[-1][0]
+                yield filas
+    finally:
+        # Cancelar los tramos pendientes si el cliente corta la descarga
+        for _, futuro in pendientes:
+            futuro.cancel()
+
+
+def exportar_csv(lotes):
+    """
+    CSV por partes: la cabecera sale de inmediato y luego un bloque por lote.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS)
+    yield buffer.getvalue()
+    for filas in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(filas)
+        yield buffer.getvalue()
+
+
+class _Sumidero(io.RawIOBase):
+    """
+    Archivo de sólo escritura que acumula los bytes hasta que se los retira.
+    """
+
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.partes.append(bytes(b))
+        return len(b)
+
+    def retirar(self) -> bytes:
+        datos = b"".join(self.partes)
+        self.partes = []
+        return datos
+
+
+def exportar_parquet(lotes, row_group: int = OSMA_EXPORT_ROW_GROUP):
+    """
+    Parquet por partes: cada row group se envía apenas se escribe; el pie va al final.
+    """
+    if pq is None:
+        raise RuntimeError("pyarrow no está instalado: la exportación Parquet no está disponible.")
+
+    schema = pa.schema([
+        ("fecha", pa.string()),
+        ("servicio", pa.string()),
+        ("monitoreable", pa.string()),
+        ("variable", pa.string()),
+        ("idVariable", pa.int64()),
+        ("valor", pa.float64()),
+    ])
+    sumidero = _Sumidero()
+    writer = pq.ParquetWriter(sumidero, schema)
+    acumuladas = []
+
+    def _escribir():
+        columnas = list(zip(*acumuladas))
+        writer.write_table(pa.Table.from_arrays([pa.array(c) for c in columnas], schema=schema))
+        acumuladas.clear()
+
+    for filas in lotes:
+        acumuladas.extend(filas)
+        if len(acumuladas) >= row_group:
+            _escribir()
+            yield sumidero.retirar()
+    if acumuladas:
+        _escribir()
+    writer.close()
+    yield sumidero.retirar()
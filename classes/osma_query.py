@@ -0,0 +1,153 @@
+# File: classes/osma_query.py
+
+import os
+import json
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from classes.osma import Osma
+from classes.osma_catalog import get_catalog
+from classes.resources import setting
+from classes.osma_series import fechas_a_texto, valores_a_lista, agregacion_de_variable
+from classes.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Intervalos del formulario -> intervalos de la API de OSMA
+INTERVALOS = {"Minuto": "MIN", "Hora": "HOUR", "Día": "DAY", "Mes": "MONTH"}
+MAX_VARIABLES_PARALELAS = int(os.getenv("OSMA_MAX_PARALLEL_VARIABLES", 8))
+# Reagregar desde datos más finos en cache en vez de pedir el intervalo a la API es opcional:
+# sólo coincide con OSMA si la agregación de la variable es la misma que usa la API
+OSMA_RESAMPLEO_LOCAL = os.getenv("OSMA_RESAMPLEO_LOCAL", "0") == "1"
+# Agregaciones por nombre de variable que corrigen o completan AGREGACION_POR_PREFIJO (JSON)
+OSMA_AGREGACIONES = json.loads(os.getenv("OSMA_AGREGACIONES", "{}"))
+
+
+def crear_cliente_osma() -> Osma:
+    """
+    Crea un cliente Osma autenticado con OSMA_USERNAME/OSMA_PASSWORD
+    (variables de entorno o config.json).
+    """
+    username = setting("OSMA_USERNAME")
+    password = setting("OSMA_PASSWORD")
+    if not username or not password:
+        raise ValueError("Error: No se encontraron credenciales de OSMA en el entorno ni en config.json.")
+
+    osma = Osma()
+    if not osma.authenticate_and_get_access_token_via_api(username, password):
+        raise ValueError("Error: No se pudo autenticar contra la API de OSMA.")
+    return osma
+
+
+class OsmaQueryEngine:
+    """
+    Ejecuta una consulta OSMA completa: resuelve las variables seleccionadas a
+    idVariable, las descarga en paralelo y alinea las series en un índice común.
+    """
+
+    def __init__(self, osma: Osma, max_workers: int = MAX_VARIABLES_PARALELAS):
+        self.osma = osma
+        self.max_workers = max_workers
+
+    def resolver_variables(self, servicios, monitoreables, variables):
+        """
+        Devuelve las ternas (servicio, monitoreable, variable) seleccionadas con su idVariable.
+        """
+        return get_catalog().resolver(servicios, monitoreables, variables)
+
+    def descargar(self, seleccion, fecha_inicio, fecha_fin, intervalo):
+        """
+        Descarga todas las variables en paralelo. Devuelve (series, errores).
+        """
+        def _descargar(item):
+            agregacion = agregacion_de_variable(item["variable"], OSMA_AGREGACIONES) if OSMA_RESAMPLEO_LOCAL else None
+            return self.osma.getSerie(item["idVariable"], fecha_inicio, fecha_fin, intervalo, agregacion)
+
+        series, errores = [], []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="osma-var") as executor:
+            futures = [(item, executor.submit(_descargar, item)) for item in seleccion]
+            for item, future in futures:
+                try:
+                    serie = future.result()
+                except Exception as e:
+                    logger.error(f"Error al descargar la variable {item['idVariable']}: {e}")
+                    errores.append({**item, "error": str(e)})
+                    continue
+                if serie is None:
+                    errores.append({**item, "error": "Sin datos"})
+                    continue
+                series.append((item, serie))
+        return series, errores
+
+    @staticmethod
+    def alinear(series):
+        """
+        Une las series en un índice de timestamps común; los huecos quedan en None.
+        """
+        if not series:
+            return [], []
+        indice = np.unique(np.concatenate([serie.times for _, serie in series]))
+        columnas = []
+        for item, serie in series:
+            valores = np.full(len(indice), np.nan)
+            valores[np.searchsorted(indice, serie.times)] = serie.values
+            columnas.append({**item, "values": valores_a_lista(valores)})
+        return fechas_a_texto(indice), columnas
+
+    def preparar(self, servicios, monitoreables, variables, fecha_inicio, fecha_fin, intervalo_formulario):
+        """
+        Valida la consulta y devuelve (seleccion, fecha_inicio, fecha_fin, intervalo de la API).
+        """
+        intervalo = INTERVALOS.get(intervalo_formulario, intervalo_formulario)
+        try:
+            if isinstance(fecha_inicio, str):
+                fecha_inicio = datetime.datetime.fromisoformat(fecha_inicio)
+            if isinstance(fecha_fin, str):
+                fecha_fin = datetime.datetime.fromisoformat(fecha_fin)
+        except ValueError:
+            raise ValueError("Formato de fecha inválido.")
+        if fecha_fin <= fecha_inicio:
+            raise ValueError("La fecha de fin debe ser posterior a la de inicio.")
+
+        seleccion = self.resolver_variables(servicios, monitoreables, variables)
+        if not seleccion:
+            raise ValueError("Ninguna variable seleccionada corresponde a los servicios y monitoreables elegidos.")
+        return seleccion, fecha_inicio, fecha_fin, intervalo
+
+    def ejecutar(self, servicios, monitoreables, variables, fecha_inicio, fecha_fin, intervalo_formulario):
+        seleccion, fecha_inicio, fecha_fin, intervalo = self.preparar(
+            servicios, monitoreables, variables, fecha_inicio, fecha_fin, intervalo_formulario)
+
+        with span("osma.query"):
+            series, errores = self.descargar(seleccion, fecha_inicio, fecha_fin, intervalo)
+            timestamps, columnas = self.alinear(series)
+        logger.info(f"Consulta OSMA: {len(columnas)} series, {len(timestamps)} timestamps, {len(errores)} errores")
+
+        resultado = f"{len(columnas)} de {len(seleccion)} variables descargadas, {len(timestamps)} registros."
+        return {
+            "resultado": resultado,
+            "intervalo": intervalo,
+            "timestamps": timestamps,
+            "series": columnas,
+            "errores": errores,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_query_engine() -> OsmaQueryEngine:
+    """
+    Motor compartido por el proceso, con el cliente autenticado una sola vez.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = OsmaQueryEngine(crear_cliente_osma())
+    return _engine
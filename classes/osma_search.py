@@ -0,0 +1,148 @@
+# File: classes/osma_search.py
+
+import bisect
+import threading
+
+from classes.osma_catalog import get_catalog
+from classes.text_utils import normalize_query
+
+TIPOS = ("servicio", "monitoreable", "variable")
+# Cobertura mínima de los trigramas de la consulta para aceptar una corrección automática
+UMBRAL_CORRECCION = 0.6
+
+
+def _trigramas(texto: str, cerrar: bool = True) -> set:
+    # Se marca el inicio de cada palabra; el final sólo en los nombres (la consulta puede estar incompleta)
+    texto = " " + texto.replace(" ", "  ") + (" " if cerrar else "")
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class OsmaSearchIndex:
+    """
+    Índice de búsqueda sobre los nombres del catálogo OSMA (servicios, monitoreables y
+    variables), insensible a acentos y mayúsculas. Las consultas cortas se resuelven por
+    prefijo de palabra; las demás por trigramas, lo que tolera errores de tipeo.
+    """
+
+    def __init__(self, catalogo):
+        self.catalogo = catalogo
+        self.entradas = []
+        for serv in catalogo.servicios:
+            self.entradas.append(("servicio", serv, serv, None, None))
+            for mon in catalogo.monitoreables[serv]:
+                self.entradas.append(("monitoreable", mon, serv, mon, None))
+                for nombre, id_variable in catalogo.variables[(serv, mon)].items():
+                    self.entradas.append(("variable", nombre, serv, mon, id_variable))
+
+        self.normalizados = [normalize_query(e[1]) for e in self.entradas]
+        self.tamanos = []
+        self.trigramas = {}
+        palabras = []
+        for i, norm in enumerate(self.normalizados):
+            grams = _trigramas(norm)
+            self.tamanos.append(len(grams))
+            for gram in grams:
+                self.trigramas.setdefault(gram, []).append(i)
+            palabras.extend((palabra, i) for palabra in set(norm.split()))
+        palabras.sort()
+        self.palabras = [p for p, _ in palabras]
+        self.palabras_idx = [i for _, i in palabras]
+
+    def _candidatos_prefijo(self, consulta):
+        inicio = bisect.bisect_left(self.palabras, consulta)
+        puntajes = {}
+        for pos in range(inicio, len(self.palabras)):
+            if not self.palabras[pos].startswith(consulta):
+                break
+            puntajes[self.palabras_idx[pos]] = 1.0
+        return puntajes
+
+    def _candidatos_trigramas(self, consulta):
+        grams = _trigramas(consulta, cerrar=False)
+        comunes = {}
+        for gram in grams:
+            for i in self.trigramas.get(gram, ()):
+                comunes[i] = comunes.get(i, 0) + 1
+        minimo = max(1, int(len(grams) * 0.4))
+        # Cobertura de la consulta, y un desempate a favor de los nombres más cortos
+        return {
+            i: n / len(grams) + 0.1 * n / self.tamanos[i]
+            for i, n in comunes.items() if n >= minimo
+        }
+
+    def buscar(self, texto: str, tipo: str = None, servicios=None, monitoreables=None, limite: int = 10):
+        """
+        Mejores coincidencias para `texto`, opcionalmente restringidas a un tipo y a los
+        servicios/monitoreables seleccionados. Los nombres repetidos (por ejemplo la misma
+        variable en varios monitoreables) se agrupan en un solo resultado.
+        """
+        consulta = normalize_query(texto)
+        if not consulta:
+            return []
+        if len(consulta) < 3:
+            puntajes = self._candidatos_prefijo(consulta)
+        else:
+            puntajes = self._candidatos_trigramas(consulta)
+
+        servicios = set(servicios) if servicios else None
+        monitoreables = set(monitoreables) if monitoreables else None
+        tokens = consulta.split()
+        resultados = {}
+        for i, puntaje in puntajes.items():
+            e_tipo, nombre, serv, mon, id_variable = self.entradas[i]
+            if tipo and e_tipo != tipo:
+                continue
+            if servicios is not None and serv not in servicios:
+                continue
+            if monitoreables is not None and mon is not None and mon not in monitoreables:
+                continue
+            norm = self.normalizados[i]
+            if norm.startswith(consulta):
+                puntaje += 1.0
+            elif all(any(p.startswith(t) for p in norm.split()) for t in tokens):
+                puntaje += 0.5
+            clave = (e_tipo, nombre)
+            actual = resultados.get(clave)
+            if actual is not None:
+                actual["coincidencias"] += 1
+                if puntaje <= actual["puntaje"]:
+                    continue
+            resultados[clave] = {
+                "tipo": e_tipo,
+                "nombre": nombre,
+                "servicio": serv,
+                "monitoreable": mon,
+                "idVariable": id_variable,
+                "puntaje": round(puntaje, 3),
+                "coincidencias": actual["coincidencias"] if actual else 1,
+            }
+        return sorted(resultados.values(), key=lambda r: (-r["puntaje"], r["nombre"]))[:limite]
+
+    def corregir(self, texto: str, tipo: str, servicios=None, monitoreables=None):
+        """
+        Nombre del catálogo al que se refiere `texto` (con errores de tipeo o sin acentos),
+        o None si no hay una coincidencia suficientemente clara.
+        """
+        resultados = self.buscar(texto, tipo, servicios, monitoreables, limite=2)
+        if not resultados or resultados[0]["puntaje"] < UMBRAL_CORRECCION:
+            return None
+        if len(resultados) > 1 and resultados[1]["puntaje"] == resultados[0]["puntaje"]:
+            return None
+        return resultados[0]["nombre"]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> OsmaSearchIndex:
+    """
+    Índice del catálogo vigente; se reconstruye cuando el catálogo se recarga.
+    """
+    global _index
+    catalogo = get_catalog()
+    if _index is None or _index.catalogo is not catalogo:
+        with _index_lock:
+            if _index is None or _index.catalogo is not catalogo:
+                _index = OsmaSearchIndex(catalogo)
+    return _index
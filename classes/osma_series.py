@@ -0,0 +1,137 @@
+# File: classes/osma_series.py
+
+import numpy as np
+
+# Orden de los intervalos de OSMA, del más fino al más grueso, y su unidad en NumPy
+INTERVALOS = ["MIN", "HOUR", "DAY", "MONTH"]
+UNIDADES = {"MIN": "m", "HOUR": "h", "DAY": "D", "MONTH": "M"}
+AGREGACIONES = ("mean", "min", "max", "sum", "last")
+# Agregación que reproduce un intervalo de la API a partir de uno más fino, según el comienzo
+# del nombre de la variable: los contadores (energía, producción, paradas) se suman y las
+# magnitudes instantáneas se promedian. Las variables que no figuran no se reagregan localmente.
+AGREGACION_POR_PREFIJO = (
+    ("Energia", "sum"),
+    ("Producción", "sum"),
+    ("Paradas", "sum"),
+    ("Tiempo Parado", "sum"),
+    ("Residuo", "sum"),
+    ("Temperatura", "mean"),
+    ("Humedad", "mean"),
+    ("Potencia", "mean"),
+    ("Corriente", "mean"),
+    ("THD", "mean"),
+    ("FP", "mean"),
+)
+
+
+def intervalos_mas_finos(interval):
+    """
+    Intervalos más finos que `interval`, del más cercano al más fino.
+    """
+    if interval not in INTERVALOS:
+        return []
+    return INTERVALOS[:INTERVALOS.index(interval)][::-1]
+
+
+def agregacion_de_variable(nombre, extra=None):
+    """
+    Agregación para reagregar localmente la variable `nombre`, o None si no se conoce.
+    `extra` ({nombre: agregación}) tiene prioridad sobre AGREGACION_POR_PREFIJO.
+    """
+    if extra and nombre in extra:
+        return extra[nombre]
+    for prefijo, agregacion in AGREGACION_POR_PREFIJO:
+        if (nombre or "").startswith(prefijo):
+            return agregacion
+    return None
+
+
+def fechas_a_texto(times):
+    """
+    Timestamps datetime64 como texto "YYYY-MM-DD HH:MM:SS".
+    """
+    return np.char.replace(np.datetime_as_string(times, unit="s"), "T", " ").tolist()
+
+
+def valores_a_lista(values):
+    """
+    Valores float64 como lista serializable a JSON (NaN como None).
+    """
+    valores = values.astype(object)
+    valores[np.isnan(values)] = None
+    return valores.tolist()
+
+
+class OsmaSeries:
+    """
+    Serie de una variable OSMA en arreglos tipados: timestamps datetime64[s] y valores
+    float64 (16 bytes por punto, contra más de 100 en listas de strings y floats).
+    Los timestamps están ordenados y no se repiten.
+    """
+
+    __slots__ = ("times", "values", "variable")
+
+    def __init__(self, times, values, variable=None):
+        self.times = np.asarray(times, dtype="datetime64[s]")
+        self.values = np.asarray(values, dtype=np.float64)
+        self.variable = variable
+
+    @classmethod
+    def from_api(cls, dates, values, variable=None):
+        """
+        Convierte las listas de la API (fechas ISO como texto y valores como texto o
+        número) en una serie ordenada, sin recorrerlas en Python.
+        """
+        times = np.array(dates, dtype="datetime64[s]")
+        values = np.array(values, dtype=np.float64)
+        times, idx = np.unique(times, return_index=True)
+        return cls(times, values[idx], variable)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    def slice(self, fechaInicio, fechaFin):
+        """
+        Puntos en [fechaInicio, fechaFin].
+        """
+        inicio = np.searchsorted(self.times, np.datetime64(fechaInicio, "s"), side="left")
+        fin = np.searchsorted(self.times, np.datetime64(fechaFin, "s"), side="right")
+        return OsmaSeries(self.times[inicio:fin], self.values[inicio:fin], self.variable)
+
+    def resample(self, interval, how="mean"):
+        """
+        Agrega la serie a un intervalo más grueso (MIN, HOUR, DAY o MONTH). Cada grupo
+        queda rotulado con el inicio de su período; los NaN se ignoran.
+        """
+        if how not in AGREGACIONES:
+            raise ValueError(f"Agregación no soportada: {how}")
+        valid = ~np.isnan(self.values)
+        times, values = self.times[valid], self.values[valid]
+        if not len(times):
+            return OsmaSeries(times, values, self.variable)
+
+        periodos = times.astype(f"datetime64[{UNIDADES[interval]}]")
+        # Serie ordenada: cada período es un tramo contiguo que empieza en `inicios`
+        etiquetas, inicios = np.unique(periodos, return_index=True)
+        if how == "mean":
+            conteos = np.diff(np.append(inicios, len(values)))
+            agregados = np.add.reduceat(values, inicios) / conteos
+        elif how == "sum":
+            agregados = np.add.reduceat(values, inicios)
+        elif how == "min":
+            agregados = np.minimum.reduceat(values, inicios)
+        elif how == "max":
+            agregados = np.maximum.reduceat(values, inicios)
+        else:
+            agregados = values[np.append(inicios[1:], len(values)) - 1]
+        return OsmaSeries(etiquetas.astype("datetime64[s]"), agregados, self.variable)
+
+    def to_dict(self):
+        """
+        Formato de la API: fechas "YYYY-MM-DD HH:MM:SS" y valores (NaN como None).
+        """
+        return {"date": fechas_a_texto(self.times), "values": valores_a_lista(self.values), "variable": self.variable}
@@ -0,0 +1,174 @@
+# File: classes/osma_series_cache.py
+
+import os
+import datetime
+import threading
+
+import numpy as np
+
+from classes.cache import thread_local_connection
+from classes.osma_series import valores_a_lista
+
+# Ruta del cache local de series OSMA; vacía desactiva el cache
+OSMA_SERIES_CACHE_PATH = os.getenv("OSMA_SERIES_CACHE_PATH", "osma_series.sqlite3")
+# Los datos más recientes que esto (segundos) pueden estar incompletos: no se marcan como cubiertos
+OSMA_SERIES_RECENT_MARGIN = float(os.getenv("OSMA_SERIES_RECENT_MARGIN", 15 * 60))
+
+_FORMATO = "%Y-%m-%d %H:%M:%S"
+
+
+def normalizar_fecha(fecha) -> str:
+    """
+    Timestamp comparable como texto ("YYYY-MM-DD HH:MM:SS") a partir de un datetime
+    o del string que devuelve la API.
+    """
+    if isinstance(fecha, str):
+        fecha = datetime.datetime.fromisoformat(fecha.replace("Z", ""))
+    return fecha.replace(tzinfo=None).strftime(_FORMATO)
+
+
+class OsmaSeriesCache:
+    """
+    Cache en disco de las series descargadas, por variable e intervalo.
+
+    Los puntos se guardan en una tabla indexada por (idVariable, intervalo, ts) y un
+    índice de cobertura registra qué rangos ya se descargaron completos, de modo que
+    una consulta sólo pide a la API los huecos que faltan.
+    """
+
+    def __init__(self, path: str = OSMA_SERIES_CACHE_PATH, recent_margin: float = OSMA_SERIES_RECENT_MARGIN):
+        self.path = path
+        self.recent_margin = recent_margin
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS points ("
+            " id_variable INTEGER NOT NULL,"
+            " interval TEXT NOT NULL,"
+            " ts TEXT NOT NULL,"
+            " date TEXT NOT NULL,"
+            " value REAL,"
+            " PRIMARY KEY (id_variable, interval, ts)) WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS coverage ("
+            " id_variable INTEGER NOT NULL,"
+            " interval TEXT NOT NULL,"
+            " start TEXT NOT NULL,"
+            " end TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS coverage_var ON coverage (id_variable, interval, start)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS variables ("
+            " id_variable INTEGER PRIMARY KEY,"
+            " name TEXT)"
+        )
+
+    def _connect(self):
+        return thread_local_connection(self._local, self.path)
+
+    def _cobertura(self, conn, idVariable, interval):
+        return conn.execute(
+            "SELECT start, end FROM coverage WHERE id_variable = ? AND interval = ? ORDER BY start",
+            (idVariable, interval)
+        ).fetchall()
+
+    def faltantes(self, idVariable, interval, fechaInicio, fechaFin):
+        """
+        Tramos (datetime, datetime) de [fechaInicio, fechaFin] que todavía no están en el cache.
+        """
+        inicio, fin = normalizar_fecha(fechaInicio), normalizar_fecha(fechaFin)
+        huecos = []
+        cursor = inicio
+        for start, end in self._cobertura(self._connect(), idVariable, interval):
+            if end < cursor:
+                continue
+            if start > fin:
+                break
+            if start > cursor:
+                huecos.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < fin:
+            huecos.append((cursor, fin))
+        return [(datetime.datetime.strptime(a, _FORMATO), datetime.datetime.strptime(b, _FORMATO))
+                for a, b in huecos]
+
+    def guardar(self, idVariable, interval, fechaInicio, fechaFin, datos):
+        """
+        Guarda los puntos descargados para [fechaInicio, fechaFin] y marca el rango como cubierto.
+        La parte más reciente que `recent_margin` se guarda pero no se marca, para volver a pedirla.
+        """
+        # NaN se guarda como NULL
+        valores = valores_a_lista(np.asarray(datos['values'], dtype=float))
+        filas = [(idVariable, interval, normalizar_fecha(fecha), fecha, valor)
+                 for fecha, valor in zip(datos['date'], valores)]
+        limite = datetime.datetime.now() - datetime.timedelta(seconds=self.recent_margin)
+        inicio = normalizar_fecha(fechaInicio)
+        fin = normalizar_fecha(min(fechaFin, limite))
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?)", filas)
+            if datos.get('variable') is not None:
+                conn.execute("INSERT OR REPLACE INTO variables VALUES (?, ?)", (idVariable, datos['variable']))
+            if inicio < fin:
+                # Fusionar con los rangos cubiertos que se solapan o tocan
+                solapados = conn.execute(
+                    "SELECT rowid, start, end FROM coverage"
+                    " WHERE id_variable = ? AND interval = ? AND start <= ? AND end >= ?",
+                    (idVariable, interval, fin, inicio)
+                ).fetchall()
+                for rowid, start, end in solapados:
+                    inicio, fin = min(inicio, start), max(fin, end)
+                    conn.execute("DELETE FROM coverage WHERE rowid = ?", (rowid,))
+                conn.execute("INSERT INTO coverage VALUES (?, ?, ?, ?)", (idVariable, interval, inicio, fin))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def cargar(self, idVariable, interval, fechaInicio, fechaFin):
+        """
+        Puntos guardados en [fechaInicio, fechaFin], en orden cronológico, con el formato de
+        getDatosVariableNotDivided: fechas como texto y valores en un arreglo float64 (NULL es NaN).
+        """
+        conn = self._connect()
+        filas = conn.execute(
+            "SELECT date, value FROM points"
+            " WHERE id_variable = ? AND interval = ? AND ts >= ? AND ts <= ? ORDER BY ts",
+            (idVariable, interval, normalizar_fecha(fechaInicio), normalizar_fecha(fechaFin))
+        ).fetchall()
+        nombre = conn.execute("SELECT name FROM variables WHERE id_variable = ?", (idVariable,)).fetchone()
+        return {
+            'date': [fila[0] for fila in filas],
+            'values': np.array([fila[1] for fila in filas], dtype=float),
+            'variable': nombre[0] if nombre else None,
+        }
+
+    def invalidar(self, idVariable=None):
+        """
+        Borra los datos de una variable, o todo el cache si no se indica ninguna.
+        """
+        conn = self._connect()
+        for tabla in ("points", "coverage", "variables"):
+            if idVariable is None:
+                conn.execute(f"DELETE FROM {tabla}")
+            else:
+                conn.execute(f"DELETE FROM {tabla} WHERE id_variable = ?", (idVariable,))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_series_cache():
+    """
+    Cache compartido por todos los clientes Osma del proceso, o None si está desactivado.
+    """
+    global _default_cache
+    if _default_cache is None and OSMA_SERIES_CACHE_PATH:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = OsmaSeriesCache()
+    return _default_cache
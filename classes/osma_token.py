@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Vida útil supuesta cuando ni la respuesta del login ni el token indican su vencimiento
+OSMA_TOKEN_TTL = float(os.getenv("OSMA_TOKEN_TTL", 3600))
+# Los tokens se renuevan en segundo plano esta cantidad de segundos antes de vencer
+OSMA_TOKEN_REFRESH_MARGIN = float(os.getenv("OSMA_TOKEN_REFRESH_MARGIN", 300))
+# Un token sin uso durante este tiempo (segundos) deja de renovarse con el timer
+OSMA_TOKEN_IDLE_TIMEOUT = float(os.getenv("OSMA_TOKEN_IDLE_TIMEOUT", 30 * 60))
+
+# Errores esperables de un login: red o HTTP, respuesta inválida o rechazada
+LOGIN_ERRORS = (requests.RequestException, ValueError, KeyError, TypeError)
+
+
+def token_expiry(token: str, expires_in=None) -> float:
+    """
+    Vencimiento (segundos epoch) de un token: el claim "exp" del JWT si lo tiene,
+    si no `expires_in` segundos desde ahora, y si no OSMA_TOKEN_TTL.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, ValueError, KeyError, TypeError):
+        pass
+    return time.time() + float(expires_in or OSMA_TOKEN_TTL)
+
+
+def credentials_key(username: str, password: str) -> str:
+    # La contraseña forma parte de la clave: una contraseña incorrecta nunca reutiliza un token válido
+    return f"{username}:{hashlib.sha256(password.encode('utf-8')).hexdigest()[:16]}"
+
+
+class OsmaTokenManager:
+    """
+    Cache de tokens de acceso de OSMA compartida por el proceso, por credenciales.
+
+    - Los tokens vigentes se devuelven desde memoria, sin I/O.
+    - A menos de OSMA_TOKEN_REFRESH_MARGIN del vencimiento se sigue devolviendo el token
+      actual mientras se renueva en segundo plano; un timer además agenda esa renovación
+      con anticipación, mientras el token se haya usado en los últimos OSMA_TOKEN_IDLE_TIMEOUT.
+    - Los llamadores concurrentes que esperan un login comparten una única llamada.
+    """
+
+    def __init__(self, refresh_margin: float = OSMA_TOKEN_REFRESH_MARGIN,
+                 idle_timeout: float = OSMA_TOKEN_IDLE_TIMEOUT):
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self._tokens = {}     # clave -> (token, refresh_at, expires_at)
+        self._last_used = {}  # clave -> último get_token (segundos epoch)
+        self._inflight = {}   # clave -> Future del login en curso
+        self._timers = {}
+        self._lock = threading.Lock()
+        self.logins = 0
+
+    def get_token(self, key: str, login) -> str:
+        """
+        Devuelve un token válido para `key`. `login()` debe devolver (token, expires_at) o lanzar.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(key)
+            self._last_used[key] = now
+        if entry is not None and now < entry[1]:
+            return entry[0]
+        if entry is not None and now < entry[2]:
+            self._refresh_in_background(key, login)
+            return entry[0]
+        return self._login(key, login).result()
+
+    def invalidate(self, key: str):
+        """
+        Olvida el token de `key` (p. ej. después de que la API lo rechazó).
+        """
+        with self._lock:
+            self._tokens.pop(key, None)
+            timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _login(self, key: str, login) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._inflight[key] = future
+
+        try:
+            token, expires_at = login()
+            # Los tokens de vida corta se renuevan a mitad de su vida
+            refresh_at = expires_at - min(self.refresh_margin, (expires_at - time.time()) / 2)
+            with self._lock:
+                self._tokens[key] = (token, refresh_at, expires_at)
+                self.logins += 1
+            self._schedule_refresh(key, login, refresh_at)
+            future.set_result(token)
+        except LOGIN_ERRORS as e:
+            logger.error(f"Falló el login de OSMA: {e}")
+            future.set_exception(e)
+        except BaseException as e:
+            # Error inesperado (un bug): se propaga, pero los que esperan el login no quedan colgados
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future
+
+    def _refresh_in_background(self, key: str, login):
+        with self._lock:
+            if key in self._inflight:
+                return
+        threading.Thread(target=self._login, args=(key, login), name="osma-token-refresh", daemon=True).start()
+
+    def _scheduled_refresh(self, key: str, login):
+        with self._lock:
+            idle = time.time() - self._last_used.get(key, 0)
+            if idle > self.idle_timeout:
+                self._timers.pop(key, None)
+        # Sin uso reciente no se renueva: el próximo get_token hará login si el token venció
+        if idle > self.idle_timeout:
+            logger.info(f"Token de OSMA sin uso hace {idle:.0f}s: no se renueva")
+            return
+        self._login(key, login)
+
+    def _schedule_refresh(self, key: str, login, refresh_at: float):
+        delay = refresh_at - time.time()
+        if delay <= 0:
+            return
+        timer = threading.Timer(delay, self._scheduled_refresh, args=(key, login))
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.pop(key, None)
+            self._timers[key] = timer
+        if previous is not None:
+            previous.cancel()
+        timer.start()
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def get_token_manager() -> OsmaTokenManager:
+    """
+    Gestor de tokens compartido por todos los clientes Osma del proceso.
+    """
+    global _default_manager
+    if _default_manager is None:
+        with _default_lock:
+            if _default_manager is None:
+                _default_manager = OsmaTokenManager()
+    return _default_manager
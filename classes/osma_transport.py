@@ -0,0 +1,119 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from classes.resources import shared
+
+logger = logging.getLogger(__name__)
+
+OSMA_CONNECT_TIMEOUT = float(os.getenv("OSMA_CONNECT_TIMEOUT", 5))
+OSMA_READ_TIMEOUT = float(os.getenv("OSMA_READ_TIMEOUT", 60))
+OSMA_MAX_RETRIES = int(os.getenv("OSMA_MAX_RETRIES", 3))
+OSMA_POOL_SIZE = int(os.getenv("OSMA_POOL_SIZE", 32))
+
+
+class OsmaTransport:
+    """
+    HTTP transport for the OSMA APIs: one keep-alive session with a connection
+    pool per host, connect/read timeouts, retries with jittered exponential
+    backoff on 429/5xx and connection errors, and per-request latency stats.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, pool_size: int = OSMA_POOL_SIZE,
+                 connect_timeout: float = OSMA_CONNECT_TIMEOUT, read_timeout: float = OSMA_READ_TIMEOUT,
+                 max_retries: int = OSMA_MAX_RETRIES, backoff_base: float = 0.5, backoff_max: float = 10.0):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=2000)
+        self._requests = 0
+        self._retries = 0
+        self._errors = 0
+
+    @property
+    def session(self) -> requests.Session:
+        # Sessions (and their sockets) must not be shared across a fork
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+                    self._pid = os.getpid()
+        return self._session
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # "Full jitter": uniform between 0 and the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            t0 = time.perf_counter()
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code not in self.RETRY_STATUS or attempt >= self.max_retries:
+                    self._record(time.perf_counter() - t0)
+                    return response
+                logger.warning(f"OSMA {method} {url} returned {response.status_code}, retrying")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    self._record(time.perf_counter() - t0, error=True)
+                    raise
+                logger.warning(f"OSMA {method} {url} failed ({e}), retrying")
+            self._record(time.perf_counter() - t0, retry=True)
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    def _record(self, latency: float, retry: bool = False, error: bool = False):
+        with self._lock:
+            self._latencies.append(latency)
+            self._requests += 1
+            self._retries += int(retry)
+            self._errors += int(error)
+
+    def stats(self) -> dict:
+        """
+        Latency percentiles (seconds) over the most recent requests, plus counters.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {"requests": self._requests, "retries": self._retries, "errors": self._errors}
+        if latencies:
+            def pct(p):
+                return latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))]
+            stats.update({
+                "mean": sum(latencies) / len(latencies),
+                "p50": pct(50),
+                "p95": pct(95),
+                "p99": pct(99),
+                "max": latencies[-1],
+            })
+        return stats
+
+
+def get_default_transport() -> OsmaTransport:
+    """
+    Transport shared by every Osma client in the process, so they share the pool.
+    """
+    return shared("osma_transport", OsmaTransport)
@@ -0,0 +1,111 @@
+import os
+import re
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Token budgets for the prompt sent to the completion model
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", 8000))
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", 3000))
+PROMPT_HISTORY_ANSWER_TOKENS = int(os.getenv("PROMPT_HISTORY_ANSWER_TOKENS", 600))
+
+_CHUNK_SEPARATOR = re.compile(r"\n\s*\n")
+
+
+class PromptBuilder:
+    """
+    Assembles the messages for the completion model within a token budget.
+
+    Layout (stable prefix first, so the provider's prompt caching gets hits):
+      1. system: the static instruction
+      2. conversation history, oldest first
+      3. system: the retrieved context for this turn
+      4. user: the query
+    History is trimmed from the oldest turn and long past answers are cut;
+    retrieved chunks are taken in relevance order until the context budget is spent.
+    """
+
+    def __init__(self, instruction: str, model: str,
+                 max_tokens: int = PROMPT_MAX_TOKENS,
+                 max_context_tokens: int = PROMPT_CONTEXT_TOKENS,
+                 max_history_answer_tokens: int = PROMPT_HISTORY_ANSWER_TOKENS):
+        self.instruction = instruction
+        self.max_tokens = max_tokens
+        self.max_context_tokens = max_context_tokens
+        self.max_history_answer_tokens = max_history_answer_tokens
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # The encoding files are downloaded on first use; offline, estimate instead
+                logger.warning(f"Could not load a tiktoken encoding ({e}), estimating token counts")
+        self.instruction_tokens = self.count_tokens(instruction)
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return len(text) // 4 + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text)[:max_tokens]) + " [...]"
+        return text[:max_tokens * 4] + " [...]"
+
+    def select_chunks(self, contexts: list, budget: int) -> list:
+        """
+        Split each source (one per bucket, already in relevance order) into chunks and
+        take them round-robin by rank (best of each source first) until `budget` is spent.
+        """
+        sources = [[c for c in _CHUNK_SEPARATOR.split(text) if c.strip()] for text in contexts if text]
+        selected = []
+        used = 0
+        for rank in range(max((len(s) for s in sources), default=0)):
+            for chunks in sources:
+                if rank >= len(chunks):
+                    continue
+                tokens = self.count_tokens(chunks[rank])
+                if used + tokens > budget:
+                    # Keep at least part of the most relevant chunk
+                    if not selected:
+                        selected.append(self.truncate(chunks[rank], budget))
+                    return selected
+                selected.append(chunks[rank])
+                used += tokens
+        return selected
+
+    def build(self, query: str, history: list, contexts: list) -> list:
+        query_tokens = self.count_tokens(query)
+        context_text = "\n\n".join(self.select_chunks(contexts, self.max_context_tokens))
+        context_tokens = self.count_tokens(context_text)
+
+        # Whatever the instruction, context and query leave is available for history
+        history_budget = self.max_tokens - self.instruction_tokens - context_tokens - query_tokens
+        turns = []
+        for q, a in reversed(history):
+            a = self.truncate(a, self.max_history_answer_tokens)
+            tokens = self.count_tokens(q) + self.count_tokens(a)
+            if tokens > history_budget:
+                break
+            turns.append((q, a))
+            history_budget -= tokens
+        if len(turns) < len(history):
+            logger.info("Prompt budget: kept %d of %d history turns", len(turns), len(history))
+
+        messages = [{"role": "system", "content": self.instruction}]
+        for q, a in reversed(turns):
+            messages.append({"role": "user", "content": q})
+            messages.append({"role": "assistant", "content": a})
+        messages.append({"role": "system", "content": f"===\n{context_text}\n==="})
+        messages.append({"role": "user", "content": query})
+        return messages
@@ -0,0 +1,177 @@
+import os
+import json
+import logging
+import secrets
+import threading
+
+from classes.keyword_matcher import KeywordMatcher
+from classes.instruction_parser import InstructionParser
+from classes.topic_classifier import TopicClassifier
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CONFIG_PATH = os.getenv("CONFIG_PATH", "config.json")
+KEYWORDS_PATH = os.getenv("COFFEE_KEYWORDS_PATH", "kw_cafe.txt")
+INSTRUCTIONS_PATH = os.getenv("INSTRUCTIONS_PATH", "instructions.json")
+TOPIC_CLASSIFIER_PATH = os.getenv("TOPIC_CLASSIFIER_PATH", "topic_classifier.json")
+
+# Process-wide resources, built on first use (see shared())
+_resources = {}
+# Reentrant: building a client reads the configuration through shared() as well
+_lock = threading.RLock()
+
+
+def shared(name: str, factory):
+    """
+    Return the resource `name`, building it with `factory()` the first time.
+    Every component of the process gets the same instance.
+    """
+    value = _resources.get(name)
+    if value is None:
+        with _lock:
+            value = _resources.get(name)
+            if value is None:
+                value = _resources[name] = factory()
+    return value
+
+
+def _project_path(filename: str) -> str:
+    return filename if os.path.isabs(filename) else os.path.join(PROJECT_ROOT, filename)
+
+
+def _load_config_file() -> dict:
+    try:
+        with open(CONFIG_PATH) as config_file:
+            return json.load(config_file)
+    except FileNotFoundError:
+        return {}
+
+
+def setting(key: str, default=None):
+    """
+    Value of a setting: the environment variable, else config.json, else `default`.
+    """
+    value = os.getenv(key)
+    if value:
+        return value
+    return shared("config_file", _load_config_file).get(key) or default
+
+
+def _load_api_config() -> dict:
+    config = {key: setting(key) for key in (
+        "OPENAI_API_KEY", "GROUNDX_API_KEY", "GROUNDX_BUCKET_ID_SPANISH", "GROUNDX_BUCKET_ID_ENGLISH")}
+    if not all(config.values()):
+        raise ValueError("No API key or bucket ID found in environment variables or config.json.")
+    for key in ("GROUNDX_BUCKET_ID_SPANISH", "GROUNDX_BUCKET_ID_ENGLISH"):
+        if not str(config[key]).isdigit():
+            raise ValueError(f"Error: {key} must be a valid integer.")
+        config[key] = int(config[key])
+    return config
+
+
+def get_api_config() -> dict:
+    """
+    OpenAI and GroundX keys and the GroundX bucket ids (as integers).
+    """
+    return shared("api_config", _load_api_config)
+
+
+def get_decision_token_secret() -> bytes:
+    """
+    Key signing the /check_rag decision tokens: DECISION_TOKEN_SECRET, else a random key
+    made once per process. gunicorn workers inherit the master's key (preload_app); other
+    multi-process setups need DECISION_TOKEN_SECRET for tokens to resolve on every worker.
+    """
+    return shared("decision_token_secret",
+                  lambda: (setting("DECISION_TOKEN_SECRET") or secrets.token_hex(32)).encode("utf-8"))
+
+
+def get_openai_client():
+    def _build():
+        from openai import OpenAI
+        return OpenAI(api_key=get_api_config()["OPENAI_API_KEY"])
+    return shared("openai", _build)
+
+
+def get_async_openai_client():
+    def _build():
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=get_api_config()["OPENAI_API_KEY"])
+    return shared("async_openai", _build)
+
+
+# GROUNDX_BASE_URL points the clients elsewhere (e.g. bench/fake_servers.py); the
+# OpenAI clients read OPENAI_BASE_URL by themselves
+def get_groundx_client():
+    def _build():
+        from groundx import GroundX
+        return GroundX(api_key=get_api_config()["GROUNDX_API_KEY"], base_url=os.getenv("GROUNDX_BASE_URL"))
+    return shared("groundx", _build)
+
+
+def get_async_groundx_client():
+    def _build():
+        from groundx import AsyncGroundX
+        return AsyncGroundX(api_key=get_api_config()["GROUNDX_API_KEY"], base_url=os.getenv("GROUNDX_BASE_URL"))
+    return shared("async_groundx", _build)
+
+
+def _load_coffee_keywords() -> tuple:
+    keywords = []
+    try:
+        with open(_project_path(KEYWORDS_PATH), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                # Ignore empty lines or comment lines
+                if not line or line.startswith("#"):
+                    continue
+                keywords.append(line.lower())
+    except FileNotFoundError:
+        logger.warning(f"Could not find {KEYWORDS_PATH}, defaulting to empty keyword list.")
+    return tuple(keywords)
+
+
+def get_coffee_keywords() -> tuple:
+    return shared("coffee_keywords", _load_coffee_keywords)
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    return shared("keyword_matcher", lambda: KeywordMatcher(get_coffee_keywords()))
+
+
+def _load_topic_classifier():
+    try:
+        classifier = TopicClassifier.load(_project_path(TOPIC_CLASSIFIER_PATH))
+        logger.info(f"Loaded local topic classifier from {TOPIC_CLASSIFIER_PATH}")
+        return classifier
+    except FileNotFoundError:
+        logger.warning(f"Could not find {TOPIC_CLASSIFIER_PATH}, every non-keyword query will use the LLM classifier.")
+        return False
+
+
+def get_topic_classifier():
+    """
+    Local topic classifier, or None when its file is missing.
+    """
+    # False marks "looked for it and found nothing", so the file is not searched again
+    return shared("topic_classifier", _load_topic_classifier) or None
+
+
+def get_instruction() -> str:
+    return shared("instruction", lambda: InstructionParser(INSTRUCTIONS_PATH).load_instruction())
+
+
+def preload():
+    """
+    Build every shared resource now instead of on the first request. Called in the
+    gunicorn master (gunicorn.conf.py) so workers inherit them copy-on-write.
+    """
+    from classes.osma_catalog import get_catalog
+    from classes.local_index import get_local_index
+
+    get_api_config()
+    get_decision_token_secret()
+    for build in (get_openai_client, get_async_openai_client, get_groundx_client, get_async_groundx_client,
+                  get_keyword_matcher, get_topic_classifier, get_instruction, get_catalog, get_local_index):
+        build()
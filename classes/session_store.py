@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from classes.cache import TTLCache, thread_local_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 2 * 60 * 60      # Sessions idle for 2 hours are evicted
+DEFAULT_MAXSIZE = 10000        # Maximum sessions kept per namespace
+
+
+class SessionStore:
+    """
+    Key/value store for per-session state. Values must be JSON-serializable so
+    that every backend can hold them.
+    """
+
+    def get(self, session_id: str, default=None):
+        raise NotImplementedError
+
+    def set(self, session_id: str, value):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def update(self, session_id: str, fn, default=None):
+        """
+        Atomically replace the session value with `fn(current_value)` and return it.
+        """
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store: a bounded LRU with TTL eviction. Only suitable when a
+    single worker process serves all requests.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, session_id, default=None):
+        return self._cache.get(session_id, default)
+
+    def set(self, session_id, value):
+        self._cache.set(session_id, value)
+
+    def delete(self, session_id):
+        self._cache.pop(session_id)
+
+    def update(self, session_id, fn, default=None):
+        return self._cache.update(session_id, fn, default)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store backed by a SQLite file, shared by every gunicorn worker on the host.
+    """
+
+    def __init__(self, path: str, namespace: str = "default",
+                 maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " namespace TEXT NOT NULL,"
+                " session_id TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, session_id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (namespace, expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return thread_local_connection(self._local, self.path)
+
+    def _read(self, conn, session_id):
+        row = conn.execute(
+            "SELECT value FROM sessions WHERE namespace = ? AND session_id = ? AND expires_at >= ?",
+            (self.namespace, session_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn, session_id, value):
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (namespace, session_id, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, session_id, json.dumps(value, ensure_ascii=False), time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        # Drop expired sessions, then the least recently touched ones above maxsize
+        conn.execute("DELETE FROM sessions WHERE namespace = ? AND expires_at < ?", (self.namespace, time.time()))
+        conn.execute(
+            "DELETE FROM sessions WHERE namespace = ? AND session_id IN ("
+            " SELECT session_id FROM sessions WHERE namespace = ?"
+            " ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.maxsize)
+        )
+
+    def get(self, session_id, default=None):
+        value = self._read(self._connect(), session_id)
+        return default if value is None else value
+
+    def set(self, session_id, value):
+        self._write(self._connect(), session_id, value)
+
+    def delete(self, session_id):
+        self._connect().execute(
+            "DELETE FROM sessions WHERE namespace = ? AND session_id = ?",
+            (self.namespace, session_id)
+        )
+
+    def update(self, session_id, fn, default=None):
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent workers serialize
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = self._read(conn, session_id)
+            new_value = fn(default if current is None else current)
+            self._write(conn, session_id, new_value)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return new_value
+
+
+def create_session_store(namespace: str, ttl: float = None) -> SessionStore:
+    """
+    Build the session store selected by SESSION_STORE_BACKEND ("memory" or "sqlite").
+    `ttl` overrides SESSION_TTL for namespaces whose entries are short-lived.
+    """
+    backend = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("SESSION_TTL", DEFAULT_TTL)) if ttl is None else ttl
+    maxsize = int(os.getenv("SESSION_MAXSIZE", DEFAULT_MAXSIZE))
+
+    if backend == "sqlite":
+        path = os.getenv("SESSION_STORE_PATH", "sessions.sqlite3")
+        logger.info(f"Using SQLite session store '{namespace}' at {path}")
+        return SQLiteSessionStore(path, namespace=namespace, maxsize=maxsize, ttl=ttl)
+    if backend != "memory":
+        raise ValueError(f"Error: unknown SESSION_STORE_BACKEND '{backend}'.")
+    return InMemorySessionStore(maxsize=maxsize, ttl=ttl)
@@ -0,0 +1,374 @@
+import os
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.cache import TTLCache
+from classes.session_store import InMemorySessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+# Coalescing: flush buffered text after this many seconds or bytes, whichever comes first
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL", 0.05))
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", 256))
+# Finished streams stay available for resumption this long (seconds)
+SSE_RESUME_TTL = float(os.getenv("SSE_RESUME_TTL", 120))
+# Threads generating SSE answers per worker; further streams wait for a free one
+SSE_MAX_PRODUCERS = int(os.getenv("SSE_MAX_PRODUCERS", 16))
+# How often a stream in progress is copied to the shared store (seconds), for resumes on other workers
+SSE_SHARE_INTERVAL = float(os.getenv("SSE_SHARE_INTERVAL", 0.5))
+
+
+_END = object()
+
+
+def coalesce(chunks, flush_interval: float = SSE_FLUSH_INTERVAL, flush_bytes: int = SSE_FLUSH_BYTES):
+    """
+    Group small text chunks into larger batches. A batch is emitted once it holds
+    `flush_bytes` bytes or `flush_interval` seconds after its first chunk, even while
+    the source is still waiting for the next one: `chunks` is read on a helper thread.
+    """
+    pending = queue.Queue()
+
+    def _read():
+        try:
+            for chunk in chunks:
+                pending.put((chunk, None))
+            pending.put((_END, None))
+        except Exception as e:
+            pending.put((_END, e))
+
+    threading.Thread(target=_read, name="sse-read", daemon=True).start()
+    batch, size, deadline = [], 0, None
+    while True:
+        try:
+            chunk, error = pending.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            yield "".join(batch)
+            batch, size, deadline = [], 0, None
+            continue
+        if chunk is _END:
+            break
+        if not batch:
+            deadline = time.monotonic() + flush_interval
+        batch.append(chunk)
+        size += len(chunk.encode("utf-8"))
+        if size >= flush_bytes or time.monotonic() >= deadline:
+            yield "".join(batch)
+            batch, size, deadline = [], 0, None
+    if batch:
+        yield "".join(batch)
+    if error is not None:
+        raise error
+
+
+async def acoalesce(chunks, flush_interval: float = SSE_FLUSH_INTERVAL, flush_bytes: int = SSE_FLUSH_BYTES):
+    """
+    Async counterpart of coalesce for async generators. The next chunk is awaited
+    as a task, so a batch can be flushed on time without cancelling the source.
+    """
+    source = chunks.__aiter__()
+    batch, size, deadline = [], 0, None
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(source.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                yield "".join(batch)
+                batch, size, deadline = [], 0, None
+                continue
+            task, next_chunk = next_chunk, None
+            try:
+                chunk = task.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                if batch:
+                    yield "".join(batch)
+                raise
+            if not batch:
+                deadline = time.monotonic() + flush_interval
+            batch.append(chunk)
+            size += len(chunk.encode("utf-8"))
+            if size >= flush_bytes or time.monotonic() >= deadline:
+                yield "".join(batch)
+                batch, size, deadline = [], 0, None
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
+    if batch:
+        yield "".join(batch)
+
+
+def format_event(data: str, event_id: str = None, event: str = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    # Every line of the payload needs its own "data:" field
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class StreamBuffer:
+    """
+    Batches produced for one answer. Event ids are "<stream_id>:<seq>", seq starting at 1,
+    so a reconnecting client can ask for everything after the last id it saw.
+    """
+
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+        self.batches = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def append(self, batch: str):
+        with self._cond:
+            self.batches.append(batch)
+            self._cond.notify_all()
+
+    def finish(self, error: str = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"batches": list(self.batches), "done": self.done, "error": self.error}
+
+    def _format(self, start: int, end: int) -> str:
+        return "".join(
+            format_event(self.batches[i], event_id=f"{self.stream_id}:{i + 1}")
+            for i in range(start, end)
+        )
+
+    def _opening_event(self) -> str:
+        # Announces the stream id so a client can resume even before the first batch
+        return format_event(self.stream_id, event_id=f"{self.stream_id}:0", event="start")
+
+    def _closing_event(self) -> str:
+        if self.error:
+            return format_event(self.error, event="error")
+        return format_event("", event="done")
+
+    def events(self, after_seq: int = 0, timeout: float = 300):
+        """
+        Yield SSE-formatted events after `after_seq`, blocking until the answer is complete.
+        """
+        sent = after_seq
+        deadline = time.monotonic() + timeout
+        if after_seq == 0:
+            yield self._opening_event()
+        while True:
+            with self._cond:
+                while len(self.batches) <= sent and not self.done:
+                    if not self._cond.wait(timeout=max(0.0, deadline - time.monotonic())):
+                        return
+                end = len(self.batches)
+                done = self.done
+                payload = self._format(sent, end)
+            sent = end
+            if payload:
+                yield payload
+            if done:
+                yield self._closing_event()
+                return
+
+    async def aevents(self, after_seq: int = 0, poll_interval: float = SSE_FLUSH_INTERVAL, timeout: float = 300):
+        """
+        Async counterpart of events. Polls at the coalescing interval, so the
+        event loop is never blocked on the condition variable.
+        """
+        sent = after_seq
+        deadline = time.monotonic() + timeout
+        if after_seq == 0:
+            yield self._opening_event()
+        while time.monotonic() < deadline:
+            end = len(self.batches)
+            done = self.done
+            if end > sent:
+                yield self._format(sent, end)
+                sent = end
+            if done:
+                yield self._closing_event()
+                return
+            await asyncio.sleep(poll_interval)
+
+
+class SharedStreamBuffer(StreamBuffer):
+    """
+    Read-only view of a stream produced by another worker, reloaded from the shared
+    store every SSE_SHARE_INTERVAL until the stream is done.
+    """
+
+    def __init__(self, stream_id: str, store, snapshot: dict):
+        super().__init__(stream_id)
+        self._store = store
+        self._load(snapshot)
+
+    def _load(self, snapshot: dict):
+        self.batches = snapshot["batches"]
+        self.done = snapshot["done"]
+        self.error = snapshot["error"]
+
+    def _refresh(self):
+        snapshot = self._store.get(self.stream_id)
+        if snapshot is None:
+            self.done, self.error = True, "stream expired"
+        else:
+            self._load(snapshot)
+
+    def events(self, after_seq: int = 0, timeout: float = 300):
+        sent = after_seq
+        deadline = time.monotonic() + timeout
+        if after_seq == 0:
+            yield self._opening_event()
+        while True:
+            end = len(self.batches)
+            if end > sent:
+                yield self._format(sent, end)
+                sent = end
+            if self.done:
+                yield self._closing_event()
+                return
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(SSE_SHARE_INTERVAL)
+            self._refresh()
+
+    async def aevents(self, after_seq: int = 0, poll_interval: float = SSE_SHARE_INTERVAL, timeout: float = 300):
+        sent = after_seq
+        deadline = time.monotonic() + timeout
+        if after_seq == 0:
+            yield self._opening_event()
+        while True:
+            end = len(self.batches)
+            if end > sent:
+                yield self._format(sent, end)
+                sent = end
+            if self.done:
+                yield self._closing_event()
+                return
+            if time.monotonic() >= deadline:
+                return
+            await asyncio.sleep(poll_interval)
+            await asyncio.to_thread(self._refresh)
+
+
+class StreamRegistry:
+    """
+    Runs answer generation independently of the client connection and keeps the
+    batches in a short-lived buffer, so a dropped client can resume instead of
+    regenerating the answer.
+
+    Answers are generated on a bounded pool (SSE_MAX_PRODUCERS threads per worker).
+    Buffers live in process memory; with a shared session store (SESSION_STORE_BACKEND=sqlite)
+    each stream is also copied there, so a resume reaching another worker replays it
+    from the store instead of failing.
+    """
+
+    def __init__(self, ttl: float = SSE_RESUME_TTL, maxsize: int = 1000,
+                 max_producers: int = SSE_MAX_PRODUCERS, store=None):
+        self._buffers = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tasks = set()  # keeps async producers referenced until they finish
+        self._producers = ThreadPoolExecutor(max_workers=max_producers, thread_name_prefix="sse")
+        store = store or create_session_store("sse", ttl=ttl)
+        # A process-local store adds nothing to the buffers above
+        self._shared = None if isinstance(store, InMemorySessionStore) else store
+
+    def _new_buffer(self) -> StreamBuffer:
+        buffer = StreamBuffer(uuid.uuid4().hex)
+        self._buffers.set(buffer.stream_id, buffer)
+        return buffer
+
+    def _share(self, buffer: StreamBuffer):
+        if self._shared is None:
+            return
+        try:
+            self._shared.set(buffer.stream_id, buffer.snapshot())
+        except Exception as e:
+            # Only resumes on other workers depend on it: the stream itself goes on
+            logger.warning(f"Could not share SSE stream {buffer.stream_id}: {e}")
+
+    def _finished(self, buffer: StreamBuffer):
+        # Refresh the TTL so the finished stream stays resumable for SSE_RESUME_TTL
+        self._buffers.set(buffer.stream_id, buffer)
+        self._share(buffer)
+
+    def start(self, chunks) -> StreamBuffer:
+        """
+        Consume the `chunks` generator on the producer pool, coalescing it into the buffer.
+        """
+        buffer = self._new_buffer()
+        # Shared before the client sees the stream id, so any worker can resume it
+        self._share(buffer)
+
+        def _produce():
+            shared_at = time.monotonic()
+            try:
+                for batch in coalesce(chunks):
+                    buffer.append(batch)
+                    if time.monotonic() - shared_at >= SSE_SHARE_INTERVAL:
+                        self._share(buffer)
+                        shared_at = time.monotonic()
+                buffer.finish()
+            except Exception as e:
+                logger.error(f"SSE stream {buffer.stream_id} failed: {e}")
+                buffer.finish(error=str(e))
+            self._finished(buffer)
+
+        self._producers.submit(_produce)
+        return buffer
+
+    async def astart(self, chunks) -> StreamBuffer:
+        """
+        Async counterpart of start: consumes an async generator in an asyncio task.
+        """
+        buffer = self._new_buffer()
+        if self._shared is not None:
+            await asyncio.to_thread(self._share, buffer)
+
+        async def _produce():
+            shared_at = time.monotonic()
+            try:
+                async for batch in acoalesce(chunks):
+                    buffer.append(batch)
+                    if self._shared is not None and time.monotonic() - shared_at >= SSE_SHARE_INTERVAL:
+                        await asyncio.to_thread(self._share, buffer)
+                        shared_at = time.monotonic()
+                buffer.finish()
+            except Exception as e:
+                logger.error(f"SSE stream {buffer.stream_id} failed: {e}")
+                buffer.finish(error=str(e))
+            await asyncio.to_thread(self._finished, buffer)
+
+        task = asyncio.ensure_future(_produce())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return buffer
+
+    def resume(self, last_event_id: str):
+        """
+        Return (buffer, seq) for a Last-Event-ID, or (None, 0) if the stream is gone.
+        """
+        stream_id, _, seq = (last_event_id or "").partition(":")
+        if not seq.isdigit():
+            return None, 0
+        buffer = self._buffers.get(stream_id)
+        if buffer is None and self._shared is not None:
+            snapshot = self._shared.get(stream_id)
+            if snapshot is not None:
+                buffer = SharedStreamBuffer(stream_id, self._shared, snapshot)
+        if buffer is None:
+            return None, 0
+        return buffer, int(seq)
@@ -0,0 +1,23 @@
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold_accents(text: str) -> str:
+    """
+    Strip diacritics so that "Café" and "cafe" compare equal.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form of a user query used as a cache key: accent-folded,
+    lower-cased, punctuation removed and whitespace collapsed.
+    """
+    text = fold_accents(text).lower()
+    text = _NON_WORD.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
@@ -0,0 +1,107 @@
+import json
+import math
+import random
+import zlib
+import logging
+
+from classes.text_utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class TopicClassifier:
+    """
+    Offline coffee-topic classifier: hashed character n-grams fed to a
+    logistic regression. Scoring a query takes well under a millisecond on CPU.
+
+    Predictions inside the (low, high) confidence band are treated as
+    ambiguous so the caller can escalate them to the LLM classifier.
+    """
+
+    def __init__(self, weights=None, bias: float = 0.0, n_features: int = 2 ** 18,
+                 ngram_range=(2, 4), low: float = 0.2, high: float = 0.75):
+        self.weights = weights or {}  # feature index -> weight (sparse)
+        self.bias = bias
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.low = low
+        self.high = high
+
+    def featurize(self, text: str) -> dict:
+        """
+        L2-normalized counts of hashed character n-grams of the normalized text.
+        """
+        text = f" {normalize_query(text)} "
+        counts = {}
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for i in range(len(text) - n + 1):
+                # crc32 is stable across processes, unlike hash()
+                index = zlib.crc32(text[i:i + n].encode("utf-8")) % self.n_features
+                counts[index] = counts.get(index, 0.0) + 1.0
+        norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+        return {index: value / norm for index, value in counts.items()}
+
+    def predict_proba(self, text: str) -> float:
+        features = self.featurize(text)
+        z = self.bias + sum(self.weights.get(i, 0.0) * v for i, v in features.items())
+        return 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+
+    def decide(self, text: str):
+        """
+        Return True/False when confident, or None when the query is ambiguous.
+        """
+        probability = self.predict_proba(text)
+        if probability >= self.high:
+            return True
+        if probability <= self.low:
+            return False
+        return None
+
+    def fit(self, texts, labels, epochs: int = 40, learning_rate: float = 0.5,
+            l2: float = 1e-4, seed: int = 13):
+        """
+        Train with plain SGD on the logistic loss.
+        """
+        samples = [(self.featurize(t), float(y)) for t, y in zip(texts, labels)]
+        rng = random.Random(seed)
+        weights = {}
+        bias = 0.0
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1.0 + epoch * 0.1)
+            for features, label in samples:
+                z = bias + sum(weights.get(i, 0.0) * v for i, v in features.items())
+                error = 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0))) - label
+                for i, v in features.items():
+                    w = weights.get(i, 0.0)
+                    weights[i] = w - rate * (error * v + l2 * w)
+                bias -= rate * error
+        self.weights = weights
+        self.bias = bias
+        return self
+
+    def save(self, path: str):
+        data = {
+            "n_features": self.n_features,
+            "ngram_range": list(self.ngram_range),
+            "low": self.low,
+            "high": self.high,
+            "bias": round(self.bias, 6),
+            "weights": {str(i): round(w, 6) for i, w in self.weights.items() if abs(w) > 1e-6},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            weights={int(i): w for i, w in data["weights"].items()},
+            bias=data["bias"],
+            n_features=data["n_features"],
+            ngram_range=data["ngram_range"],
+            low=data["low"],
+            high=data["high"],
+        )
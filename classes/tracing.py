@@ -0,0 +1,135 @@
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Fraction of spans recorded (1.0 = all). Sampling keeps the overhead negligible under load.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+
+METRICS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with labels: cumulative bucket counts, sum and count
+    per label combination.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(snapshot.items()):
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': repr(float(bound))})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Histograms of this process, rendered in the Prometheus text format. Under
+    gunicorn every worker keeps its own registry; scrape each worker or aggregate.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, label_names, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram(
+    "cafebahia_stage_seconds",
+    "Duration of each request stage in seconds.",
+    ("stage", "status"),
+)
+
+
+def sampled(sample_rate: float = None) -> bool:
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    return rate >= 1.0 or random.random() < rate
+
+
+def observe(stage: str, seconds: float, status: str = "ok"):
+    """
+    Record an already measured duration (e.g. time to first chunk of a stream).
+    """
+    if sampled():
+        STAGE_SECONDS.observe(seconds, stage, status)
+        logger.debug("%s took %.3fs (%s)", stage, seconds, status)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time the enclosed block as `stage`; exceptions are recorded with status="error".
+    """
+    if not sampled():
+        yield
+        return
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage, status)
+        logger.debug("%s took %.3fs (%s)", stage, elapsed, status)
@@ -0,0 +1,262 @@
+import re
+import json
+import uuid
+import logging
+
+from classes.asistente import Asistente
+from classes.asistente_osma import AsistenteOSMA
+from classes.osma_query import get_query_engine
+from classes.osma_search import TIPOS, get_search_index
+from classes.osma_export import FORMATOS, iter_filas, exportar_csv, exportar_parquet, parquet_disponible
+from classes.sse import StreamRegistry
+from classes.session_store import create_session_store
+from classes.log_setup import Truncated
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "cafebahia_sid"
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+OSMA_SEARCH_MAX_RESULTS = 50
+
+
+class RequestError(Exception):
+    """
+    Invalid or failed request: the front ends answer with `payload` as JSON and `status`.
+    """
+
+    def __init__(self, payload: dict, status: int = 400):
+        super().__init__(payload)
+        self.payload = payload
+        self.status = status
+
+
+def get_session_id(request, g) -> str:
+    """
+    Return the caller's session id, taken from the session cookie or freshly generated.
+    `request` and `g` are those of the running framework (Flask or Quart).
+    """
+    if "session_id" not in g:
+        session_id = request.cookies.get(SESSION_COOKIE, "")
+        if not SESSION_ID_PATTERN.match(session_id):
+            session_id = uuid.uuid4().hex
+            g.new_session = True
+        g.session_id = session_id
+    return g.session_id
+
+
+def persist_session_cookie(response, g):
+    if g.get("new_session"):
+        response.set_cookie(SESSION_COOKIE, g.session_id, httponly=True, samesite="Lax")
+    return response
+
+
+def wants_sse(data: dict, accept: str) -> bool:
+    # SSE mode: coalesced events with ids, resumable through /chat_stream/resume
+    return data.get("stream") == "sse" or "text/event-stream" in (accept or "")
+
+
+class AppHandlers:
+    """
+    Request handling shared by app.py (Flask) and asgi_app.py (Quart). Methods take
+    plain values (session id, parsed JSON, query args) and return the JSON payload,
+    or raise RequestError; the front ends only read the request and build the response.
+    Methods that touch the session store or the OSMA API block: the ASGI app runs
+    them in a thread.
+    """
+
+    def __init__(self):
+        self.asistente = Asistente()
+        # Share the assistant's RAG service so /check_rag decisions are visible to /chat_stream
+        self.rag_service = self.asistente.rag_service
+        # Estado del asistente OSMA por sesión (compartido entre workers con SESSION_STORE_BACKEND=sqlite)
+        self.osma_sessions = create_session_store("osma")
+        # Short-lived buffers of SSE answers, for clients that reconnect with Last-Event-ID
+        self.stream_registry = StreamRegistry()
+
+    # ------------------------------------------------------------------
+    # Chat
+    # ------------------------------------------------------------------
+
+    def erase(self, session_id: str) -> dict:
+        """
+        Erase the last (query, response) pair from the caller's conversation history.
+        """
+        popped = self.asistente.erase_last_turn(session_id)
+        if popped:
+            logger.debug("Popped last item: %s", Truncated(popped))
+        return {"message": "Erased last user query and assistant response from context."}
+
+    @staticmethod
+    def feedback(data: dict) -> dict:
+        feedback_text = (data or {}).get("feedback", "")
+        if not feedback_text.strip():
+            raise RequestError({"message": "Error: No feedback text provided"})
+        logger.info("=== FEEDBACK RECEIVED ===\n%s\n========================\n", feedback_text)
+        return {"message": "¡Gracias por tu feedback!"}
+
+    def cache_stats(self) -> dict:
+        """
+        Hit/miss counters of the answer cache.
+        """
+        return self.asistente.answer_cache.stats()
+
+    def check_rag(self, data: dict) -> dict:
+        """
+        Check if the user's query should use RAG (GroundX retrieval).
+        """
+        user_message = (data or {}).get("message", "")
+        return self._rag_decision(user_message, self.rag_service.should_call_groundx(user_message))
+
+    async def acheck_rag(self, data: dict) -> dict:
+        user_message = (data or {}).get("message", "")
+        return self._rag_decision(user_message, await self.rag_service.ashould_call_groundx(user_message))
+
+    def _rag_decision(self, user_message: str, rag_used: bool) -> dict:
+        rag_token = self.rag_service.issue_decision_token(user_message, rag_used)
+        return {"is_rag": rag_used, "rag_token": rag_token}
+
+    def chat_request(self, data: dict):
+        """
+        Validate a /chat_stream body. Returns (user message, is_rag), where is_rag is the
+        classification made by /check_rag when the client sent its token, else None.
+        """
+        data = data or {}
+        user_message = data.get("message", "")
+        if not user_message:
+            raise RequestError({"message": "Error: No message provided"})
+        return user_message, self.rag_service.resolve_decision_token(data.get("rag_token"), user_message)
+
+    def resume(self, last_event_id: str):
+        """
+        Buffer of an SSE answer and the sequence number to replay it from.
+        """
+        buffer, seq = self.stream_registry.resume(last_event_id)
+        if buffer is None:
+            raise RequestError({"message": "Error: stream expired or unknown"}, 404)
+        return buffer, seq
+
+    # ------------------------------------------------------------------
+    # OSMA
+    # ------------------------------------------------------------------
+
+    def osma_init(self, session_id: str) -> dict:
+        """
+        Inicializa la sesión OSMA del usuario con un AsistenteOSMA nuevo.
+        Devuelve el prompt inicial y las opciones de servicios disponibles.
+        """
+        osma_assistant = AsistenteOSMA()
+        self.osma_sessions.set(session_id, osma_assistant.to_dict())
+        logger.info("Se ha iniciado la sesión OSMA")
+        return {"prompt": "¿Qué servicio(s) desea seleccionar?", "services": list(osma_assistant.catalogo.servicios)}
+
+    def osma_respond(self, session_id: str, data: dict) -> dict:
+        """
+        Procesa la respuesta del usuario en el flujo OSMA y devuelve
+        el siguiente prompt y, cuando corresponda, las opciones para el siguiente formulario.
+        """
+        if self.osma_sessions.get(session_id) is None:
+            raise RequestError({"error": "No se ha iniciado la sesión OSMA"})
+        respuesta = (data or {}).get("respuesta", "").strip()
+        if respuesta == "":
+            raise RequestError({"error": "Respuesta vacía"})
+
+        resultado = {}
+
+        def _avanzar(estado):
+            osma_assistant = AsistenteOSMA.from_dict(estado)
+            resultado["prompt"] = osma_assistant.procesar_respuesta(respuesta)
+            # Según el nuevo estado, devolvemos opciones para el próximo formulario.
+            resultado.update(osma_assistant.opciones_paso_actual())
+            return osma_assistant.to_dict()
+
+        self.osma_sessions.update(session_id, _avanzar, default={})
+        return resultado
+
+    @staticmethod
+    def osma_search(args) -> dict:
+        """
+        Búsqueda tolerante (acentos, prefijos, errores de tipeo) sobre el catálogo OSMA.
+        `args` son los parámetros de la URL (q, tipo, servicio, monitoreable, limite).
+        """
+        tipo = args.get("tipo") or None
+        if tipo is not None and tipo not in TIPOS:
+            raise RequestError({"error": f"Tipo no soportado: {tipo}"})
+        limite = min(args.get("limite", 10, type=int), OSMA_SEARCH_MAX_RESULTS)
+        resultados = get_search_index().buscar(
+            args.get("q", ""),
+            tipo=tipo,
+            servicios=args.getlist("servicio"),
+            monitoreables=args.getlist("monitoreable"),
+            limite=limite,
+        )
+        return {"resultados": resultados}
+
+    @staticmethod
+    def osma_query(data: dict) -> dict:
+        """
+        Descarga en paralelo todas las variables seleccionadas y devuelve
+        las series alineadas en un único payload.
+        """
+        data = data or {}
+        try:
+            return get_query_engine().ejecutar(
+                data.get("services", []),
+                data.get("monitoreables", []),
+                data.get("variables", []),
+                data.get("fechaInicio", ""),
+                data.get("fechaFin", ""),
+                data.get("intervalo", ""),
+            )
+        except ValueError as e:
+            raise RequestError({"error": str(e), "resultado": str(e)})
+        except Exception as e:
+            logger.error(f"Error in /osma_query: {e}")
+            raise RequestError({"error": str(e), "resultado": f"Error: {e}"}, 500)
+
+    @staticmethod
+    def osma_export_data(data, form) -> dict:
+        """
+        Cuerpo de /osma_export: JSON, o un formulario con el campo "consulta" (JSON)
+        para descargas directas.
+        """
+        if data:
+            return data
+        try:
+            data = json.loads((form or {}).get("consulta", "{}"))
+        except ValueError:
+            raise RequestError({"error": "El campo consulta no es JSON válido"})
+        if not isinstance(data, dict):
+            raise RequestError({"error": "El campo consulta debe ser un objeto JSON"})
+        return data
+
+    @staticmethod
+    def osma_export(data: dict):
+        """
+        Exporta la consulta OSMA como CSV o Parquet. Devuelve (generador de partes,
+        mimetype, headers): las filas se envían a medida que llegan los tramos de la API.
+        """
+        formato = data.get("formato", "csv")
+        if formato not in FORMATOS:
+            raise RequestError({"error": f"Formato no soportado: {formato}"})
+        if formato == "parquet" and not parquet_disponible():
+            raise RequestError({"error": "La exportación Parquet no está disponible en este servidor"})
+
+        try:
+            engine = get_query_engine()
+            seleccion, fecha_inicio, fecha_fin, intervalo = engine.preparar(
+                data.get("services", []),
+                data.get("monitoreables", []),
+                data.get("variables", []),
+                data.get("fechaInicio", ""),
+                data.get("fechaFin", ""),
+                data.get("intervalo", ""),
+            )
+        except ValueError as e:
+            raise RequestError({"error": str(e)})
+
+        lotes = iter_filas(engine.osma, seleccion, fecha_inicio, fecha_fin, intervalo)
+        cuerpo = exportar_csv(lotes) if formato == "csv" else exportar_parquet(lotes)
+        mimetype, extension = FORMATOS[formato]
+        headers = {"Content-Disposition": f"attachment; filename=osma_export.{extension}", "X-Accel-Buffering": "no"}
+        return cuerpo, mimetype, headers
@@ -0,0 +1,75 @@
+import time
+import argparse
+
+from classes.topic_classifier import TopicClassifier
+from train_topic_classifier import build_training_set
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies, correct, total, escalated=None, missed=None):
+    line = (f"{name:<8} accuracy={correct / total:.3f} "
+            f"p50={percentile(latencies, 50) * 1000:.3f}ms p99={percentile(latencies, 99) * 1000:.3f}ms")
+    if escalated is not None:
+        line += f" escalated={escalated}/{total + escalated}"
+    if missed is not None:
+        line += f" missed={missed}"
+    print(line)
+
+
+def evaluate_local(texts, labels, folds, low, high):
+    """
+    k-fold cross-validation: accuracy is measured on the confident predictions,
+    ambiguous ones count as escalated to the LLM. "missed" counts the coffee
+    queries decided as not about coffee, which are answered without retrieval.
+    """
+    latencies, correct, confident, escalated, missed = [], 0, 0, 0, 0
+    for fold in range(folds):
+        train = [(t, y) for i, (t, y) in enumerate(zip(texts, labels)) if i % folds != fold]
+        test = [(t, y) for i, (t, y) in enumerate(zip(texts, labels)) if i % folds == fold]
+        classifier = TopicClassifier(low=low, high=high).fit([t for t, _ in train], [y for _, y in train])
+        for text, label in test:
+            t0 = time.perf_counter()
+            decision = classifier.decide(text)
+            latencies.append(time.perf_counter() - t0)
+            if decision is None:
+                escalated += 1
+                continue
+            confident += 1
+            correct += int(decision == bool(label))
+            missed += int(decision is False and bool(label))
+    report("local", latencies, correct, max(confident, 1), escalated=escalated, missed=missed)
+
+
+def evaluate_llm(texts, labels):
+    from classes.RAG import get_rag_service
+
+    rag_service = get_rag_service()
+    latencies, correct = [], 0
+    for text, label in zip(texts, labels):
+        t0 = time.perf_counter()
+        decision = rag_service.llm_coffee_probability(text) >= 50
+        latencies.append(time.perf_counter() - t0)
+        correct += int(decision == bool(label))
+    report("llm", latencies, correct, len(texts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the local topic classifier with the LLM classifier.")
+    parser.add_argument("--seed", default="topic_queries.jsonl")
+    parser.add_argument("--log", default=None)
+    parser.add_argument("--instructions", default="instructions.json")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--low", type=float, default=0.2)
+    parser.add_argument("--high", type=float, default=0.75)
+    parser.add_argument("--llm", action="store_true", help="Also time the gpt-3.5-turbo path (needs API keys)")
+    args = parser.parse_args()
+
+    texts, labels = build_training_set(args.seed, args.log, args.instructions)
+    evaluate_local(texts, labels, args.folds, args.low, args.high)
+    if args.llm:
+        evaluate_llm(texts, labels)
@@ -0,0 +1,27 @@
+# Gunicorn settings for app.py: gunicorn app:app (this file is picked up automatically)
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_class = "gthread"
+# Streaming answers can take a while; idle keep-alive connections are closed quickly
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+keepalive = 5
+
+# Workers do not share memory: sessions (chat history, OSMA wizard state) must live
+# in the SQLite store, or a request landing on another worker finds no session
+os.environ.setdefault("SESSION_STORE_BACKEND", "sqlite")
+
+# Load the app once in the master: configuration, API clients, keyword matcher,
+# instruction and OSMA catalog are built before forking, so workers start at once
+# and share those pages copy-on-write instead of building their own copies.
+preload_app = True
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and os.environ["SESSION_STORE_BACKEND"].lower() == "memory":
+        raise RuntimeError("SESSION_STORE_BACKEND=memory only works with a single worker; use sqlite.")
+
+    from classes.resources import preload
+    preload()
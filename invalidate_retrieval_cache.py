@@ -0,0 +1,14 @@
+import os
+import sys
+
+from classes.cache import SQLiteCache
+
+# Run after re-ingesting documents into GroundX:
+#   python invalidate_retrieval_cache.py            -> drop every cached search and translation
+#   python invalidate_retrieval_cache.py <bucket>   -> drop only the searches of that bucket
+# Running workers drop their in-process copies within a few minutes (memory TTL).
+if __name__ == "__main__":
+    cache = SQLiteCache(os.getenv("RETRIEVAL_CACHE_PATH", "retrieval_cache.sqlite3"))
+    bucket_id = sys.argv[1] if len(sys.argv) > 1 else None
+    cache.invalidate(None if bucket_id is None else f"bucket:{int(bucket_id)}")
+    print(f"Retrieval cache invalidated (bucket={bucket_id or 'all'})")
@@ -82,6 +82,7 @@ function showMonitoreablesForm(monitoreablesAvailable) {
   const formHTML = `
     <div class="osma-form" id="osma-monitoreables-form">
       <h4>Seleccione los monitoreables:</h4>
+      <input type="search" class="osma-search" placeholder="Buscar monitoreable..." />
       ${monitoreablesAvailable
         .map(mon => `<label><input type="checkbox" value="${mon}" /> ${mon}</label>`)
         .join("<br>")}
@@ -90,6 +91,7 @@ function showMonitoreablesForm(monitoreablesAvailable) {
     </div>
   `;
   chatBox.innerHTML += formHTML;
+  attachOsmaSearch("osma-monitoreables-form", "monitoreable");
   document.getElementById("osma-monitoreables-next").addEventListener("click", () => {
     const selected = Array.from(
       document.querySelectorAll("#osma-monitoreables-form input[type=checkbox]:checked")
@@ -104,6 +106,60 @@ function showMonitoreablesForm(monitoreablesAvailable) {
   });
 }
 
+/**
+ * Conecta el buscador de un formulario con /osma_search: muestra sólo las opciones que
+ * coinciden (ordenadas por relevancia), más las que ya están marcadas.
+ */
+function attachOsmaSearch(formId, tipo) {
+  const form = document.getElementById(formId);
+  const input = form.querySelector(".osma-search");
+  let timer = null;
+  let controller = null;
+
+  const showAll = () => {
+    form.querySelectorAll("label").forEach(label => {
+      label.style.display = "";
+      if (label.nextElementSibling && label.nextElementSibling.tagName === "BR") {
+        label.nextElementSibling.style.display = "";
+      }
+    });
+  };
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => {
+      const q = input.value.trim();
+      if (controller) controller.abort();
+      if (!q) {
+        showAll();
+        return;
+      }
+      const params = new URLSearchParams({ q, tipo, limite: 50 });
+      window.osmaFlowState.services.forEach(s => params.append("servicio", s));
+      if (tipo === "variable") {
+        window.osmaFlowState.monitoreables.forEach(m => params.append("monitoreable", m));
+      }
+      controller = new AbortController();
+      fetch(`/osma_search?${params}`, { signal: controller.signal })
+        .then(response => response.json())
+        .then(data => {
+          const ranked = (data.resultados || []).map(r => r.nombre);
+          form.querySelectorAll("label").forEach(label => {
+            const checkbox = label.querySelector("input[type=checkbox]");
+            const visible = checkbox.checked || ranked.includes(checkbox.value);
+            label.style.display = visible ? "" : "none";
+            if (label.nextElementSibling && label.nextElementSibling.tagName === "BR") {
+              label.nextElementSibling.style.display = visible ? "" : "none";
+            }
+          });
+        })
+        .catch(err => {
+          if (err.name !== "AbortError") console.error("Error en la búsqueda OSMA:", err);
+        });
+    }, 150);
+  });
+}
+
 /**
  * Muestra el formulario de Variables. Los datos se pasan del backend.
  */
@@ -113,6 +169,7 @@ function showVariablesForm(variablesAvailable) {
   const formHTML = `
     <div class="osma-form" id="osma-variables-form">
       <h4>Seleccione las variables:</h4>
+      <input type="search" class="osma-search" placeholder="Buscar variable..." />
       ${variablesAvailable
         .map(v => `<label><input type="checkbox" value="${v}" /> ${v}</label>`)
         .join("<br>")}
@@ -121,6 +178,7 @@ function showVariablesForm(variablesAvailable) {
     </div>
   `;
   chatBox.innerHTML += formHTML;
+  attachOsmaSearch("osma-variables-form", "variable");
   document.getElementById("osma-variables-next").addEventListener("click", () => {
     const selected = Array.from(
       document.querySelectorAll("#osma-variables-form input[type=checkbox]:checked")
@@ -214,6 +272,7 @@ function showFinalConfirmation(finalPrompt) {
       <p><strong>Fechas:</strong> ${fechaInicio} a ${fechaFin}</p>
       <p><strong>Intervalo:</strong> ${intervalo}</p>
       <button id="osma-confirm">Ejecutar consulta OSMA</button>
+      <button id="osma-export">Descargar CSV</button>
     </div>
   `;
   chatBox.innerHTML += summaryHTML;
@@ -221,6 +280,9 @@ function showFinalConfirmation(finalPrompt) {
     // Aquí se llama al backend para ejecutar la consulta final.
     executeOsmaQuery({ ...window.osmaFlowState });
   });
+  document.getElementById("osma-export").addEventListener("click", () => {
+    exportOsmaQuery({ ...window.osmaFlowState, formato: "csv" });
+  });
 }
 
 
@@ -266,7 +328,7 @@ function sendOsmaAnswer(answer) {
  * Aquí puedes hacer una llamada fetch final al backend que realice la consulta.
  */
 function executeOsmaQuery(queryData) {
-  // Ejemplo: se envía al endpoint /osma_query (debes implementarlo en el backend)
+  // Se envía la selección completa al endpoint /osma_query
   fetch("/osma_query", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -285,6 +347,25 @@ function executeOsmaQuery(queryData) {
     });
 }
 
+/**
+ * Descarga la consulta como archivo. Se envía un formulario (no fetch) para que el
+ * navegador guarde la respuesta a medida que llega, sin cargarla entera en memoria.
+ */
+function exportOsmaQuery(queryData) {
+  const form = document.createElement("form");
+  form.method = "POST";
+  form.action = "/osma_export";
+  form.style.display = "none";
+  const input = document.createElement("input");
+  input.type = "hidden";
+  input.name = "consulta";
+  input.value = JSON.stringify(queryData);
+  form.appendChild(input);
+  document.body.appendChild(form);
+  form.submit();
+  form.remove();
+}
+
 /**
  * Elimina cualquier formulario OSMA que esté presente.
  */
@@ -38,6 +38,100 @@ function backgroundTyper(element, pendingTextRef, speed = 12) {
   }
 }
 
+/**
+ * Reads Server-Sent Events from a fetch response and calls onEvent({ id, type, data })
+ * for each one. Stops when onEvent returns true; returns false if the connection
+ * closed first.
+ */
+async function readSSE(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder("utf-8");
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) return false;
+    buffer += decoder.decode(value, { stream: true });
+
+    let separator;
+    while ((separator = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, separator);
+      buffer = buffer.slice(separator + 2);
+      const event = { id: null, type: "message", data: [] };
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("id: ")) event.id = line.slice(4);
+        else if (line.startsWith("event: ")) event.type = line.slice(7);
+        else if (line.startsWith("data: ")) event.data.push(line.slice(6));
+      }
+      event.data = event.data.join("\n");
+      if (onEvent(event)) return true;
+    }
+  }
+}
+
+/**
+ * Reads an SSE answer from /chat_stream, passing each text batch to onText.
+ * If the connection drops, it reconnects to /chat_stream/resume with the last
+ * event id, so the answer continues where it stopped instead of being regenerated.
+ */
+async function readChatStream(response, signal, onText, maxRetries = 3) {
+  let lastEventId = null;
+  let serverError = null;
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const finished = await readSSE(response, (event) => {
+        if (event.id) lastEventId = event.id;
+        if (event.type === "message") onText(event.data);
+        if (event.type === "error") serverError = event.data;
+        return event.type === "done" || event.type === "error";
+      });
+      if (finished) break;
+    } catch (err) {
+      if (signal && signal.aborted) throw err;
+      console.warn("SSE connection lost:", err);
+    }
+
+    if (!lastEventId || attempt >= maxRetries) {
+      throw new Error("La conexión se interrumpió antes de terminar la respuesta.");
+    }
+    console.log("Resuming stream from event", lastEventId);
+    response = await fetch(`/chat_stream/resume?last_event_id=${encodeURIComponent(lastEventId)}`, {
+      headers: { "Accept": "text/event-stream" },
+      signal: signal || undefined,
+    });
+    if (!response.ok) {
+      throw new Error("No se pudo reanudar la respuesta.");
+    }
+  }
+
+  if (serverError) throw new Error(serverError);
+}
+
+/**
+ * Once all pending text is typed, typesets math (if MathJax is present) and
+ * appends the OSMA mode switch box.
+ */
+function finishAssistantMessage(assistantMessageDiv, isTypingDone) {
+  let intervalId = setInterval(() => {
+    if (isTypingDone()) {
+      clearInterval(intervalId);
+      if (window.MathJax) {
+        console.log("Math delimiters balanced. Triggering MathJax.typesetPromise on assistantMessageDiv.");
+        window.MathJax.typesetPromise([assistantMessageDiv])
+          .then(() => {
+            console.log("MathJax re-typeset successfully after final chunk.");
+            // Agregar el cuadro OSMA al finalizar la respuesta
+            appendOsmaModeSwitchBox();
+          })
+          .catch((err) => { console.error("MathJax typeset error:", err); });
+      } else {
+        // Si MathJax no está presente, se agrega directamente el cuadro
+        appendOsmaModeSwitchBox();
+      }
+    }
+  }, 50);
+}
+
 /**
  * Sends a message to the streaming endpoint (/chat_stream) and processes the streamed response.
  * This function is triggered when the user clicks the send button.
@@ -75,6 +169,7 @@ if (message === "") {
 
     // (1) Verificar si el backend va a usar RAG
   let isRag = false;
+  let ragToken = null;
   try {
     const ragResp = await fetch("/check_rag", {
       method: "POST",
@@ -83,6 +178,7 @@ if (message === "") {
     });
     const ragData = await ragResp.json();
     isRag = ragData.is_rag;
+    ragToken = ragData.rag_token; // lets /chat_stream skip a second classification
   } catch (err) {
     console.error("Error checking RAG:", err);
   }
@@ -111,8 +207,8 @@ if (message === "") {
   try {
     const response = await fetch("/chat_stream", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message: message }),
+      headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+      body: JSON.stringify({ message: message, rag_token: ragToken, stream: "sse" }),
       signal: abortController.signal, // pass signal here
     });
 
@@ -158,54 +254,23 @@ if (message === "") {
       typeNextChar();
     }
 
-    // Start reading streaming chunks
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder("utf-8");
-
-    async function readChunk() {
-      const { done, value } = await reader.read();
-      if (done) {
-        // Espera a que finalice la escritura del texto pendiente y MathJax (si aplica)
-        let intervalId = setInterval(() => {
-          if (pendingText.length === 0) {
-            clearInterval(intervalId);
-            if (window.MathJax) {
-              console.log("Math delimiters balanced. Triggering MathJax.typesetPromise on assistantMessageDiv.");
-              window.MathJax.typesetPromise([assistantMessageDiv])
-                .then(() => {
-                  console.log("MathJax re-typeset successfully after final chunk.");
-                  // Agregar el cuadro OSMA al finalizar la respuesta
-                  appendOsmaModeSwitchBox();
-                })
-                .catch((err) => { console.error("MathJax typeset error:", err); });
-            } else {
-              // Si MathJax no está presente, se agrega directamente el cuadro
-              appendOsmaModeSwitchBox();
-            }
-          }
-        }, 50);
-        return;
-      }
-
-
-      let chunkText = decoder.decode(value, { stream: true });
-
-      // Accumulate chunk text
-      pendingText += chunkText;
-
-      // Start typing
+    // Read the SSE answer; the stream resumes by itself if the connection drops
+    await readChatStream(response, abortController.signal, (text) => {
+      pendingText += text;
       backgroundTyper(assistantMessageDiv, 12); // type chunk
-
-      // Auto-scroll to bottom
       chatBox.scrollTop = chatBox.scrollHeight;  // auto-scroll
-
-      readChunk(); // keep reading
-    }
-    readChunk();
+    });
+    finishAssistantMessage(assistantMessageDiv, () => pendingText.length === 0);
 
   } catch (err) {
     // If there's an error or we aborted
-    chatBox.removeChild(typingIndicator);
+    if (typingIndicator.parentNode) {
+      typingIndicator.parentNode.removeChild(typingIndicator);
+    }
+    if (abortController.signal.aborted) {
+      console.log("Streaming aborted by the user.");
+      return;
+    }
 
     const errorMessageDiv = document.createElement("div");
     errorMessageDiv.className = "assistant-message";
@@ -240,6 +305,7 @@ export async function sendOptionMessage(message) {
 
   // 3) Verificar si el backend usará RAG (check_rag)
   let isRag = false;
+  let ragToken = null;
   try {
     const ragResp = await fetch("/check_rag", {
       method: "POST",
@@ -248,6 +314,7 @@ export async function sendOptionMessage(message) {
     });
     const ragData = await ragResp.json();
     isRag = ragData.is_rag;  // true o false
+    ragToken = ragData.rag_token; // evita una segunda clasificación en /chat_stream
   } catch (err) {
     console.error("Error checking RAG:", err);
   }
@@ -274,8 +341,8 @@ export async function sendOptionMessage(message) {
   try {
     const response = await fetch("/chat_stream", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message })
+      headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+      body: JSON.stringify({ message, rag_token: ragToken, stream: "sse" })
     });
 
     // Quitar el indicador de escritura (si aún está en el DOM)
@@ -300,8 +367,6 @@ export async function sendOptionMessage(message) {
     }
 
     // 7) Procesar el streaming de la respuesta
-    const reader = response.body.getReader();
-    const decoder = new TextDecoder("utf-8");
     let pendingText = "";
     let isTyping = false;
 
@@ -323,45 +388,13 @@ export async function sendOptionMessage(message) {
     }
 
 
-    async function readChunk() {
-      const { done, value } = await reader.read();
-      if (done) {
-        // Espera a que finalice la escritura del texto pendiente y MathJax (si aplica)
-        let intervalId = setInterval(() => {
-          if (pendingText.length === 0) {
-            clearInterval(intervalId);
-            if (window.MathJax) {
-              console.log("Math delimiters balanced. Triggering MathJax.typesetPromise on assistantMessageDiv.");
-              window.MathJax.typesetPromise([assistantMessageDiv])
-                .then(() => {
-                  console.log("MathJax re-typeset successfully after final chunk.");
-                  // Agregar el cuadro OSMA al finalizar la respuesta
-                  appendOsmaModeSwitchBox();
-                })
-                .catch((err) => { console.error("MathJax typeset error:", err); });
-            } else {
-              // Si MathJax no está presente, se agrega directamente el cuadro
-              appendOsmaModeSwitchBox();
-            }
-          }
-        }, 50);
-        return;
-      }
-
-      let chunkText = decoder.decode(value, { stream: true });
-
-      // Accumulate chunk text
-      pendingText += chunkText;
-
-      // Start typing
-      backgroundTyper(assistantMessageDiv, 12); // type chunk
-
-      // Auto-scroll to bottom
-      chatBox.scrollTop = chatBox.scrollHeight;  // auto-scroll
-
-      readChunk(); // keep reading
-    }
-    readChunk();
+    // Leer la respuesta SSE; si se corta la conexión, se reanuda desde el último evento
+    await readChatStream(response, null, (text) => {
+      pendingText += text;
+      backgroundTyper(assistantMessageDiv, 12);
+      chatBox.scrollTop = chatBox.scrollHeight;
+    });
+    finishAssistantMessage(assistantMessageDiv, () => pendingText.length === 0);
 
   } catch (err) {
     // 8) Manejo de errores
@@ -0,0 +1,85 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from classes.cache import TTLCache
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache(ttl=60)
+    calls = []
+    start = threading.Barrier(8)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_set("key", compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ["value"] * 8
+    assert cache._inflight == {}
+
+
+def test_different_keys_are_computed_independently():
+    cache = TTLCache(ttl=60)
+    assert cache.get_or_set("a", lambda: 1) == 1
+    assert cache.get_or_set("b", lambda: 2) == 2
+    assert cache.get_or_set("a", lambda: 3) == 1
+
+
+def test_failed_computation_is_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_set("key", fail)
+    assert "key" not in cache
+    assert cache._inflight == {}
+    assert cache.get_or_set("key", lambda: "value") == "value"
+
+
+def test_expired_value_is_computed_again():
+    cache = TTLCache(ttl=0.05)
+    assert cache.get_or_set("key", lambda: 1) == 1
+    time.sleep(0.06)
+    assert cache.get_or_set("key", lambda: 2) == 2
+
+
+def test_ttl_for_gives_a_value_its_own_ttl():
+    cache = TTLCache(ttl=60)
+    cache.get_or_set("empty", lambda: "", ttl_for=lambda value: None if value else 0.05)
+    cache.get_or_set("full", lambda: "x", ttl_for=lambda value: None if value else 0.05)
+    time.sleep(0.06)
+    assert "empty" not in cache
+    assert "full" in cache
+
+
+def test_concurrent_async_misses_await_one_task():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_set("key", compute) for _ in range(8)))
+
+    assert asyncio.run(main()) == ["value"] * 8
+    assert len(calls) == 1
+    assert cache._async_inflight == {}
@@ -0,0 +1,47 @@
+from classes.keyword_matcher import KeywordMatcher
+
+
+def test_matches_whole_words_only():
+    matcher = KeywordMatcher(["ror", "tueste"])
+    assert matcher.find("Hubo un error en el servidor") is None
+    assert matcher.find("El ror del lote") == "ror"
+    assert matcher.find("retueste") is None
+
+
+def test_plain_keyword_matches_its_plural():
+    matcher = KeywordMatcher(["grano", "tueste", "aroma"])
+    assert matcher.find("Tengo granos verdes") == "granos"
+    assert matcher.find("distintos tuestes") == "tuestes"
+    assert matcher.find("aromas frutales") == "aromas"
+    assert matcher.find("una granola") is None
+
+
+def test_stem_matches_any_ending_but_not_inside_a_word():
+    matcher = KeywordMatcher(["tost*"])
+    assert matcher.find("una tostadora nueva") == "tostadora"
+    assert matcher.find("tost") == "tost"
+    assert matcher.find("atostado") is None
+
+
+def test_stem_wins_over_word_for_the_same_term():
+    assert KeywordMatcher(["cafet", "cafet*"]).find("cafetera") == "cafetera"
+    assert KeywordMatcher(["cafet*", "cafet"]).find("cafetera") == "cafetera"
+
+
+def test_phrases_match_across_whitespace():
+    matcher = KeywordMatcher(["café  verde"])
+    assert matcher.find("Compré CAFÉ\n  Verde ayer") == "cafe\n  verde"
+    assert matcher.find("un café bien verde") is None
+    assert matcher.find("café") is None
+
+
+def test_accents_and_case_are_folded():
+    matcher = KeywordMatcher(["acidez", "café"])
+    assert matcher.find("Mucha ÁCIDEZ") == "acidez"
+    assert matcher.find("un cafe") == "cafe"
+
+
+def test_no_keywords_never_match():
+    matcher = KeywordMatcher(["", "  ", "*"])
+    assert matcher.pattern is None
+    assert matcher.find("cafe") is None
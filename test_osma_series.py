@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from classes.osma_series import OsmaSeries
+
+
+def _serie(puntos):
+    return OsmaSeries.from_api([fecha for fecha, _ in puntos], [valor for _, valor in puntos], "Energia")
+
+
+def _como_dict(serie):
+    return dict(zip(serie.to_dict()["date"], serie.to_dict()["values"]))
+
+
+MINUTOS = _serie([
+    ("2025-01-01 10:00:00", 1.0),
+    ("2025-01-01 10:30:00", 3.0),
+    ("2025-01-01 10:59:59", 5.0),
+    ("2025-01-01 11:00:00", 10.0),
+    ("2025-01-01 13:15:00", 7.0),
+    ("2025-01-01 13:45:00", 9.0),
+])
+
+
+@pytest.mark.parametrize("how, esperado", [
+    ("mean", {"2025-01-01 10:00:00": 3.0, "2025-01-01 11:00:00": 10.0, "2025-01-01 13:00:00": 8.0}),
+    ("sum", {"2025-01-01 10:00:00": 9.0, "2025-01-01 11:00:00": 10.0, "2025-01-01 13:00:00": 16.0}),
+    ("min", {"2025-01-01 10:00:00": 1.0, "2025-01-01 11:00:00": 10.0, "2025-01-01 13:00:00": 7.0}),
+    ("max", {"2025-01-01 10:00:00": 5.0, "2025-01-01 11:00:00": 10.0, "2025-01-01 13:00:00": 9.0}),
+    ("last", {"2025-01-01 10:00:00": 5.0, "2025-01-01 11:00:00": 10.0, "2025-01-01 13:00:00": 9.0}),
+])
+def test_resample_groups_by_period_start(how, esperado):
+    # Empty periods (12:00) produce no point
+    assert _como_dict(MINUTOS.resample("HOUR", how)) == esperado
+
+
+def test_resample_across_day_and_month_boundaries():
+    serie = _serie([
+        ("2025-01-31 23:59:59", 1.0),
+        ("2025-02-01 00:00:00", 2.0),
+        ("2025-02-28 12:00:00", 4.0),
+        ("2025-03-01 00:00:00", 8.0),
+    ])
+    assert _como_dict(serie.resample("DAY", "sum")) == {
+        "2025-01-31 00:00:00": 1.0, "2025-02-01 00:00:00": 2.0,
+        "2025-02-28 00:00:00": 4.0, "2025-03-01 00:00:00": 8.0,
+    }
+    assert _como_dict(serie.resample("MONTH", "sum")) == {
+        "2025-01-01 00:00:00": 1.0, "2025-02-01 00:00:00": 6.0, "2025-03-01 00:00:00": 8.0,
+    }
+
+
+def test_resample_ignores_nan():
+    serie = _serie([
+        ("2025-01-01 10:00:00", 2.0),
+        ("2025-01-01 10:10:00", None),
+        ("2025-01-01 10:20:00", 4.0),
+        ("2025-01-01 11:00:00", None),
+    ])
+    resultado = serie.resample("HOUR", "mean")
+    assert _como_dict(resultado) == {"2025-01-01 10:00:00": 3.0}
+    assert resultado.variable == "Energia"
+
+
+def test_resample_of_only_nan_is_empty():
+    assert len(_serie([("2025-01-01 10:00:00", None)]).resample("HOUR")) == 0
+
+
+def test_resample_rejects_unknown_aggregation():
+    with pytest.raises(ValueError):
+        MINUTOS.resample("HOUR", "median")
+
+
+def test_from_api_sorts_and_drops_repeated_timestamps():
+    serie = OsmaSeries.from_api(
+        ["2025-01-01 11:00:00", "2025-01-01 10:00:00", "2025-01-01 11:00:00"], ["2", "1", "3"])
+    assert serie.to_dict()["date"] == ["2025-01-01 10:00:00", "2025-01-01 11:00:00"]
+    assert serie.values.dtype == np.float64
+    # The first occurrence of a repeated timestamp is kept
+    assert serie.values.tolist() == [1.0, 2.0]
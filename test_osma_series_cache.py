@@ -0,0 +1,95 @@
+import math
+import datetime
+
+import pytest
+
+from classes.osma_series_cache import OsmaSeriesCache
+
+D = datetime.datetime
+
+
+def _datos(*fechas, valores=None, variable="Temperatura"):
+    return {
+        "date": [fecha.strftime("%Y-%m-%d %H:%M:%S") for fecha in fechas],
+        "values": valores if valores is not None else [float(i) for i in range(len(fechas))],
+        "variable": variable,
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OsmaSeriesCache(str(tmp_path / "series.sqlite3"), recent_margin=0)
+
+
+def _cobertura(cache):
+    return cache._cobertura(cache._connect(), 1, "HOUR")
+
+
+def test_empty_cache_misses_the_whole_range(cache):
+    assert cache.faltantes(1, "HOUR", D(2025, 1, 1), D(2025, 1, 2)) == [(D(2025, 1, 1), D(2025, 1, 2))]
+
+
+def test_gaps_between_and_after_covered_ranges(cache):
+    cache.guardar(1, "HOUR", D(2025, 1, 1), D(2025, 1, 2), _datos(D(2025, 1, 1)))
+    cache.guardar(1, "HOUR", D(2025, 1, 3), D(2025, 1, 4), _datos(D(2025, 1, 3)))
+    assert cache.faltantes(1, "HOUR", D(2024, 12, 31), D(2025, 1, 5)) == [
+        (D(2024, 12, 31), D(2025, 1, 1)),
+        (D(2025, 1, 2), D(2025, 1, 3)),
+        (D(2025, 1, 4), D(2025, 1, 5)),
+    ]
+    assert cache.faltantes(1, "HOUR", D(2025, 1, 1, 6), D(2025, 1, 1, 18)) == []
+    # Other variables and intervals are not covered
+    assert cache.faltantes(2, "HOUR", D(2025, 1, 1), D(2025, 1, 2)) == [(D(2025, 1, 1), D(2025, 1, 2))]
+    assert cache.faltantes(1, "DAY", D(2025, 1, 1), D(2025, 1, 2)) == [(D(2025, 1, 1), D(2025, 1, 2))]
+
+
+def test_touching_and_overlapping_ranges_are_merged(cache):
+    cache.guardar(1, "HOUR", D(2025, 1, 1), D(2025, 1, 2), _datos())
+    cache.guardar(1, "HOUR", D(2025, 1, 3), D(2025, 1, 4), _datos())
+    cache.guardar(1, "HOUR", D(2025, 1, 2), D(2025, 1, 3), _datos())
+    assert _cobertura(cache) == [("2025-01-01 00:00:00", "2025-01-04 00:00:00")]
+
+    cache.guardar(1, "HOUR", D(2024, 12, 31), D(2025, 1, 1, 12), _datos())
+    assert _cobertura(cache) == [("2024-12-31 00:00:00", "2025-01-04 00:00:00")]
+    assert cache.faltantes(1, "HOUR", D(2024, 12, 31), D(2025, 1, 4)) == []
+
+
+def test_recent_data_is_stored_but_not_marked_as_covered(tmp_path):
+    cache = OsmaSeriesCache(str(tmp_path / "series.sqlite3"), recent_margin=3600)
+    ahora = D.now().replace(microsecond=0)
+    inicio = ahora - datetime.timedelta(hours=3)
+    cache.guardar(1, "HOUR", inicio, ahora, _datos(inicio, ahora))
+
+    huecos = cache.faltantes(1, "HOUR", inicio, ahora)
+    assert len(huecos) == 1
+    desde, hasta = huecos[0]
+    assert hasta == ahora
+    assert ahora - datetime.timedelta(hours=1, seconds=5) <= desde <= ahora - datetime.timedelta(hours=1)
+    # The recent points are still returned
+    assert len(cache.cargar(1, "HOUR", inicio, ahora)["date"]) == 2
+
+
+def test_range_entirely_within_the_recent_margin_is_not_covered(tmp_path):
+    cache = OsmaSeriesCache(str(tmp_path / "series.sqlite3"), recent_margin=3600)
+    fin = D.now().replace(microsecond=0)
+    inicio = fin - datetime.timedelta(minutes=30)
+    cache.guardar(1, "HOUR", inicio, fin, _datos(inicio))
+    assert _cobertura(cache) == []
+    assert cache.faltantes(1, "HOUR", inicio, fin) == [(inicio, fin)]
+
+
+def test_load_returns_sorted_points_in_range_with_nan_for_nulls(cache):
+    cache.guardar(1, "HOUR", D(2025, 1, 1), D(2025, 1, 2),
+                  _datos(D(2025, 1, 1, 2), D(2025, 1, 1, 0), D(2025, 1, 1, 1), valores=[2.0, None, "1.5"]))
+    datos = cache.cargar(1, "HOUR", D(2025, 1, 1, 0), D(2025, 1, 1, 1))
+    assert datos["date"] == ["2025-01-01 00:00:00", "2025-01-01 01:00:00"]
+    assert math.isnan(datos["values"][0]) and datos["values"][1] == 1.5
+    assert datos["variable"] == "Temperatura"
+
+
+def test_invalidate_one_variable(cache):
+    cache.guardar(1, "HOUR", D(2025, 1, 1), D(2025, 1, 2), _datos(D(2025, 1, 1)))
+    cache.guardar(2, "HOUR", D(2025, 1, 1), D(2025, 1, 2), _datos(D(2025, 1, 1)))
+    cache.invalidar(1)
+    assert cache.faltantes(1, "HOUR", D(2025, 1, 1), D(2025, 1, 2)) == [(D(2025, 1, 1), D(2025, 1, 2))]
+    assert cache.faltantes(2, "HOUR", D(2025, 1, 1), D(2025, 1, 2)) == []
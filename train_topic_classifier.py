@@ -0,0 +1,67 @@
+import os
+import json
+import argparse
+
+from classes.topic_classifier import TopicClassifier
+
+
+def load_labelled_queries(path):
+    """
+    Read a JSONL file of {"query", "label"} (seed data) or {"query", "probability"}
+    (queries logged from the LLM classifier via TOPIC_QUERY_LOG).
+    """
+    texts, labels = [], []
+    if not path or not os.path.exists(path):
+        return texts, labels
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "label" in item:
+                label = int(item["label"])
+            else:
+                label = int(float(item["probability"]) >= 50)
+            texts.append(item["query"])
+            labels.append(label)
+    return texts, labels
+
+
+def load_document_summaries(path):
+    """
+    The document summaries in instructions.json are positive (coffee) examples.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return list(data["instruction"]["document_summaries"])
+
+
+def build_training_set(seed_path, log_path, instructions_path):
+    texts, labels = load_labelled_queries(seed_path)
+    logged_texts, logged_labels = load_labelled_queries(log_path)
+    texts += logged_texts
+    labels += logged_labels
+    summaries = load_document_summaries(instructions_path)
+    texts += summaries
+    labels += [1] * len(summaries)
+    return texts, labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local coffee-topic classifier.")
+    parser.add_argument("--seed", default="topic_queries.jsonl")
+    parser.add_argument("--log", default=os.getenv("TOPIC_QUERY_LOG"),
+                        help="JSONL of queries labelled by the LLM classifier")
+    parser.add_argument("--instructions", default="instructions.json")
+    parser.add_argument("--output", default="topic_classifier.json")
+    parser.add_argument("--low", type=float, default=0.2,
+                        help="At or below this probability the query is decided as not about coffee")
+    parser.add_argument("--high", type=float, default=0.75,
+                        help="At or above this probability the query is decided as about coffee")
+    args = parser.parse_args()
+
+    texts, labels = build_training_set(args.seed, args.log, args.instructions)
+    classifier = TopicClassifier(low=args.low, high=args.high).fit(texts, labels)
+    classifier.save(args.output)
+    print(f"Trained on {len(texts)} queries ({sum(labels)} about coffee), saved to {args.output}")